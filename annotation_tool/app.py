@@ -7,6 +7,7 @@ from annotation_tool.pages import (
     annotation_page,
     evaluation_page,
     leaderboard,
+    metrics_page,
     profile_page,
     user_page,
     welcome,
@@ -19,7 +20,10 @@ from annotation_tool.pages.flow_control import (
     sidebar_visible,
     USER_ID_KEY,
 )
-from annotation_tool.backend.models import get_user_annotation_count
+from annotation_tool.backend.metrics import setup_metrics
+from annotation_tool.backend.models import get_user_annotation_count, unit_of_work
+from annotation_tool.backend.query_budget import page_query_budget
+from annotation_tool.backend.startup import start_warm_up
 
 ABOUT_MD = "A tool for crowdsourced collection of music captions."
 
@@ -63,6 +67,13 @@ def set_up_sidebar():
         on_click=advance_page,
         args=["Leaderboard"],
     )
+    if metrics_page.is_metrics_admin():
+        st.sidebar.button(
+            "📈 Metrics",
+            disabled=active_page == "Metrics",
+            on_click=advance_page,
+            args=["Metrics"],
+        )
 
     annotation_count = get_user_annotation_count(st.session_state[USER_ID_KEY])
 
@@ -94,6 +105,7 @@ app_pages = {
     "Evaluation": evaluation_page.show,
     "Leaderboard": leaderboard.show,
     "FAQs": faqs.show,
+    "Metrics": metrics_page.show,
 }
 
 
@@ -106,13 +118,16 @@ def main():
             "About": ABOUT_MD,
         },
     )
-    init_session_state()
+    setup_metrics()
+    start_warm_up()
+    with unit_of_work(), page_query_budget(get_active_page):
+        init_session_state()
 
-    if sidebar_visible():
-        set_up_sidebar()
+        if sidebar_visible():
+            set_up_sidebar()
 
-    # Draw current page
-    app_pages[get_active_page()]()
+        # Draw current page
+        app_pages[get_active_page()]()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+"""Asyncio database access on SQLAlchemy's async engine.
+
+Runs independent SELECT statements concurrently, each on its own pooled connection,
+and exposes a sync wrapper so that Streamlit pages can keep calling plain functions.
+Uses asyncpg for Postgres and aiosqlite for SQLite; both are optional and only needed
+when `async = true` is set in the [db] section of secrets.toml.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, TypeVar
+
+import streamlit as st
+from sqlalchemy.engine import make_url, Row
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.sql import Executable
+
+from annotation_tool.backend.config import get_db_pool_options
+from annotation_tool.backend.utils import locked_singleton
+
+T = TypeVar("T")
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def is_async_enabled() -> bool:
+    return bool(st.secrets["db"].get("async", False))
+
+
+def to_async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+@st.experimental_singleton
+def get_async_engine() -> AsyncEngine:
+    logging.info("Creating async DB engine")
+    try:
+        return create_async_engine(
+            to_async_url(st.secrets["db"]["url"]), **get_db_pool_options()
+        )
+    except ModuleNotFoundError as e:
+        raise ModuleNotFoundError(
+            f"async = true needs the optional {e.name} driver: pip install {e.name}",
+            name=e.name,
+        ) from e
+
+
+@locked_singleton
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """An event loop running forever in a daemon thread, shared by all script runs."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="db-event-loop", daemon=True).start()
+    return loop
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the shared event loop and block until it is done."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+
+async def fetch_all(statement: Executable) -> list[Row]:
+    async with AsyncSession(get_async_engine()) as session:
+        result = await session.execute(statement)
+        return result.all()
+
+
+async def fetch_all_concurrently(*statements: Executable) -> list[list[Row]]:
+    return list(await asyncio.gather(*(fetch_all(statement) for statement in statements)))
+
+
+def fetch_all_sync(*statements: Executable) -> list[list[Row]]:
+    """Run independent SELECT statements concurrently and return their rows in order."""
+    return run_sync(fetch_all_concurrently(*statements))
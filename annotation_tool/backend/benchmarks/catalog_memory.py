@@ -0,0 +1,95 @@
+"""Compare the per-process memory of the previous and the interned track catalog.
+
+Each variant is loaded in a fresh process and the growth of its resident set size is
+reported, once with the catalog loaded and once with a Track built for every row (as
+a long-running server ends up with after enough lookups). Run from the project root:
+
+    python -m annotation_tool.backend.benchmarks.catalog_memory \\
+        --tsv-file data/split_0_test_tracks.tsv
+"""
+import argparse
+import multiprocessing
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from annotation_tool.backend.music import (
+    TrackCatalog,
+    build_catalog_table,
+    write_catalog_file,
+)
+
+
+@dataclass(frozen=True)
+class PreviousTrack:
+    """Track as it was before slots and interned license texts."""
+
+    id: str
+    audio_url: str
+    attribution: str
+    license_text: str
+
+
+def rss_kib() -> int:
+    """Resident set size of this process, read from /proc (Linux only)."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found in /proc/self/status")
+
+
+def load_previous(tsv_file: str, catalog_file: str):
+    tracks = pd.read_csv(tsv_file, delimiter="\t", converters={"TRACK_ID": str})
+    materialize = lambda: [
+        PreviousTrack(row.TRACK_ID, "", row.ATTRIBUTION, row.LICENSE)
+        for row in tracks.itertuples()
+    ]
+    return tracks, materialize
+
+
+def load_interned(tsv_file: str, catalog_file: str):
+    catalog = TrackCatalog.from_file(catalog_file)
+    return catalog, lambda: [catalog.get(track_id) for track_id in catalog.ids]
+
+
+VARIANTS = {"previous": load_previous, "interned": load_interned}
+
+
+def measure(variant: str, tsv_file: str, catalog_file: str, queue) -> None:
+    baseline = rss_kib()
+    catalog, materialize = VARIANTS[variant](tsv_file, catalog_file)
+    loaded = rss_kib()
+    tracks = materialize()
+    queue.put((loaded - baseline, rss_kib() - baseline, len(tracks)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tsv-file", default="data/split_0_test_tracks.tsv")
+    args = parser.parse_args()
+
+    catalog_file = Path(tempfile.mkdtemp()) / "catalog.arrow"
+    tracks = pd.read_csv(args.tsv_file, delimiter="\t", converters={"TRACK_ID": str})
+    write_catalog_file(build_catalog_table(tracks), catalog_file, args.tsv_file)
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'variant':>10} {'loaded MiB':>11} {'all tracks MiB':>15} {'tracks':>8}")
+    for variant in VARIANTS:
+        queue = context.Queue()
+        process = context.Process(
+            target=measure, args=(variant, args.tsv_file, str(catalog_file), queue)
+        )
+        process.start()
+        loaded, materialized, n_tracks = queue.get()
+        process.join()
+        print(
+            f"{variant:>10} {loaded / 1024:>11.1f} {materialized / 1024:>15.1f}"
+            f" {n_tracks:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
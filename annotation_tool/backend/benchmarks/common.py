@@ -0,0 +1,42 @@
+"""Helpers shared by the benchmarks: a throw-away database and a timer."""
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel, create_engine
+
+
+def create_benchmark_engine(url: Optional[str] = None, drop: bool = False) -> Engine:
+    """Create an engine with fresh tables, on a temporary SQLite file by default.
+
+    :param url: a scratch database to use instead
+    :param drop: drop the tables if the database at url already has them; without it
+        such a database is refused, so that a real one is never emptied by mistake
+    """
+    if url is None:
+        db_file = Path(tempfile.mkdtemp()) / "benchmark.db"
+        url = f"sqlite:///{db_file}"
+    engine = create_engine(url)
+    existing = set(inspect(engine).get_table_names()) & set(SQLModel.metadata.tables)
+    if existing and not drop:
+        raise ValueError(
+            f"{engine.url!r} already has the tables {sorted(existing)}, pass --drop "
+            "to drop them if it is a scratch database"
+        )
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def time_call(func: Callable[[], object], repeat: int = 20) -> float:
+    """Return the median wall time of func in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
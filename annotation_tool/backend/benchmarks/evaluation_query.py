@@ -0,0 +1,123 @@
+"""Compare the previous and the indexed query for picking an annotation to evaluate.
+
+Run from the project root, e.g.:
+
+    python -m annotation_tool.backend.benchmarks.evaluation_query --sizes 1000 10000 50000
+"""
+import argparse
+import logging
+import random
+
+import numpy as np
+from sqlalchemy import func, not_
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from annotation_tool.backend.benchmarks.common import create_benchmark_engine, time_call
+from annotation_tool.backend.models import Annotation, Evaluation
+from annotation_tool.backend.scripts.seed_synthetic_data import (
+    SyntheticData,
+    seed_synthetic_data,
+)
+
+
+def previous_query(session: Session, user_id: str, max_evaluations: int):
+    """The UNION/INTERSECT query plus second round-trip used before evaluation_count.
+
+    The INTERSECT is wrapped in a subquery, since SQLite rejects the parenthesised
+    compound select the original statement compiled to.
+    """
+    evaluations_incomplete = (
+        select(Evaluation.annotation_id)
+        .group_by(Evaluation.annotation_id)
+        .having(func.count(Evaluation.id) < max_evaluations)
+    )
+    evaluations_alias = aliased(Evaluation)
+    evaluation_by_user = select(Evaluation).where(
+        Evaluation.user_id == user_id,
+        evaluations_alias.annotation_id == Evaluation.annotation_id,
+    )
+    evaluations_not_by_user = select(evaluations_alias.annotation_id).where(
+        not_(evaluation_by_user.exists()),
+        evaluations_alias.annotation_id.not_in(
+            select(Annotation.id).where(Annotation.user_id == user_id)
+        ),
+    )
+    annotations_unevaluated_and_not_by_user = select(Annotation.id).where(
+        Annotation.user_id != user_id,
+        Annotation.id.not_in(select(Evaluation.annotation_id)),
+    )
+    incomplete_not_by_user = evaluations_incomplete.intersect(
+        evaluations_not_by_user
+    ).subquery()
+    results = session.exec(
+        annotations_unevaluated_and_not_by_user.union(
+            select(incomplete_not_by_user.c.annotation_id)
+        ).limit(1)
+    )
+    maybe_annotation_id = results.scalar_one_or_none()
+    if maybe_annotation_id is not None:
+        return session.exec(
+            select(Annotation).where(Annotation.id == maybe_annotation_id)
+        ).one()
+    return None
+
+
+def current_query(session: Session, user_id: str, max_evaluations: int):
+    return session.exec(
+        Annotation.select_evaluation_candidates(user_id, max_evaluations).limit(1)
+    ).one_or_none()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 50_000],
+        help="Number of annotations to seed; evaluations are seeded at twice that.",
+    )
+    parser.add_argument("--url", help="Database URL, defaults to a temporary SQLite file")
+    parser.add_argument(
+        "--drop", action="store_true", help="Drop the tables at --url if they exist."
+    )
+    parser.add_argument("--max-evaluations", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    # keep the seeding progress out of the table
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'annotations':>12} {'evaluations':>12} {'previous ms':>12} {'current ms':>12}")
+    for size in args.sizes:
+        engine = create_benchmark_engine(args.url, args.drop)
+        data = SyntheticData(
+            n_users=max(size // 20, 10),
+            n_annotations=size,
+            n_evaluations=2 * size,
+            n_skipped=0,
+            max_evaluations=args.max_evaluations,
+            track_ids=np.arange(10_000),
+            track_weights=np.ones(10_000),
+            seed=size,
+        )
+        seed_synthetic_data(data, engine=engine)
+        user_ids = list(data.user_ids)
+        rng = random.Random(size)
+        timings = []
+        for query in (previous_query, current_query):
+            with Session(engine) as session:
+                timings.append(
+                    time_call(
+                        lambda: query(
+                            session, rng.choice(user_ids), args.max_evaluations
+                        ),
+                        repeat=args.repeat,
+                    )
+                )
+        print(f"{size:>12} {2 * size:>12} {timings[0]:>12.2f} {timings[1]:>12.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare the previous two-query leaderboard with the single-statement one.
+
+Run from the project root, e.g.:
+
+    python -m annotation_tool.backend.benchmarks.leaderboard_query --rows 100000
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from annotation_tool.backend.benchmarks.common import create_benchmark_engine, time_call
+from annotation_tool.backend.models import (
+    Annotation,
+    Evaluation,
+    User,
+    select_leaderboard,
+)
+from annotation_tool.backend.scripts.seed_synthetic_data import (
+    SyntheticData,
+    seed_synthetic_data,
+)
+
+
+def previous_query(session: Session, start_date, end_date):
+    """The two aggregate queries joined through dicts in Python, used before
+    select_leaderboard."""
+    annotation_counts = (
+        select(Annotation.user_id, User.nickname, func.count(Annotation.id))
+        .join(User)
+        .filter(Annotation.timestamp >= start_date, Annotation.timestamp <= end_date)
+        .group_by(Annotation.user_id, User.nickname)
+    )
+    evaluation_counts = (
+        select(Evaluation.user_id, User.nickname, func.count(Evaluation.id))
+        .join(User)
+        .filter(Evaluation.timestamp >= start_date, Evaluation.timestamp <= end_date)
+        .group_by(Evaluation.user_id, User.nickname)
+    )
+    annotations_results = session.exec(annotation_counts).all()
+    evaluations_results = session.exec(evaluation_counts).all()
+    annotation_counts = {user_id: count for user_id, _, count in annotations_results}
+    evaluation_counts = {user_id: count for user_id, _, count in evaluations_results}
+    nicknames = {user_id: nickname for user_id, nickname, _ in annotations_results}
+    nicknames |= {user_id: nickname for user_id, nickname, _ in evaluations_results}
+    return [
+        (nicknames[_id], annotation_counts.get(_id, 0), evaluation_counts.get(_id, 0))
+        for _id in nicknames
+    ]
+
+
+def current_window(days: int) -> tuple[datetime, datetime]:
+    """The last `days` days up to now, e.g. for a daily or weekly leaderboard."""
+    now = datetime.utcnow()
+    return now - timedelta(days=days), now
+
+
+def current_query(session: Session, start_date, end_date, limit=None):
+    return session.exec(select_leaderboard(start_date, end_date).limit(limit)).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=100_000,
+        help="Total number of annotations and evaluations to seed (split evenly).",
+    )
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--url", help="Database URL, defaults to a temporary SQLite file")
+    parser.add_argument(
+        "--drop", action="store_true", help="Drop the tables at --url if they exist."
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    # keep the seeding progress out of the table
+    logging.getLogger().setLevel(logging.WARNING)
+
+    engine = create_benchmark_engine(args.url, args.drop)
+    data = SyntheticData(
+        n_users=args.users,
+        n_annotations=args.rows // 2,
+        n_evaluations=args.rows // 2,
+        n_skipped=0,
+        max_evaluations=10,
+        track_ids=np.arange(10_000),
+        track_weights=np.ones(10_000),
+        days=60,
+    )
+    seed_synthetic_data(data, engine=engine)
+    windows = {
+        "all time": (datetime.min, datetime.max),
+        "week": current_window(7),
+        "day": current_window(1),
+    }
+    print(f"{'window':>10} {'previous ms':>12} {'current ms':>12} {'top 10 ms':>12}")
+    with Session(engine) as session:
+        for name, (start_date, end_date) in windows.items():
+            previous = time_call(
+                lambda: previous_query(session, start_date, end_date), args.repeat
+            )
+            current = time_call(
+                lambda: current_query(session, start_date, end_date), args.repeat
+            )
+            top_10 = time_call(
+                lambda: current_query(session, start_date, end_date, limit=10),
+                args.repeat,
+            )
+            print(f"{name:>10} {previous:>12.2f} {current:>12.2f} {top_10:>12.2f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Simulate concurrent annotators and evaluators against the configured database.
+
+Every virtual user is a thread that calls the functions in models.py the way the
+pages do (one unit of work per operation) until the run time is up; with --processes
+the users are spread over several processes, like several app replicas. Latency
+percentiles and throughput are reported per operation.
+
+The virtual users are synthetic users seeded by --seed (ids starting with
+--prefix), never real ones. The run still writes annotations and evaluations, so
+point the [db] url of secrets.toml at a scratch SQLite file or Postgres database.
+Run from the project root, e.g.:
+
+    python -m annotation_tool.backend.benchmarks.load_test --seed --users 50
+"""
+import argparse
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+import numpy as np
+from sqlmodel import select
+
+from annotation_tool.backend.config import get_annotation_limit, get_evaluation_limit
+from annotation_tool.backend.models import (
+    Annotation,
+    Evaluation,
+    User,
+    add_to_db,
+    create_tables,
+    get_leaderboard_counts,
+    get_session,
+    get_track_for_annotation,
+    release_evaluation_reservation,
+    release_track_reservation,
+    unit_of_work,
+)
+from annotation_tool.backend.music import get_track_catalog
+from annotation_tool.backend.scripts.seed_synthetic_data import (
+    SyntheticData,
+    max_annotation_id,
+    seed_synthetic_data,
+)
+
+DEFAULT_MIX = "annotate=5,evaluate=4,leaderboard=1"
+
+
+def annotate(user_id: str, rng: random.Random) -> None:
+    track = get_track_for_annotation(user_id, get_annotation_limit())
+    if track is None:
+        return
+    add_to_db(
+        Annotation(
+            text="a synthetic caption written by the load test",
+            familiarity=rng.randint(0, 2),
+            track_id=track.id,
+            user_id=user_id,
+            comments="",
+        )
+    )
+    release_track_reservation(user_id, track.id)
+
+
+def evaluate(user_id: str, rng: random.Random) -> None:
+    annotation = Annotation.get_annotations_for_evaluation(
+        user_id, get_evaluation_limit()
+    )
+    if annotation is None:
+        return
+    rating = rng.randint(0, 5)
+    add_to_db(Evaluation(rating=rating, annotation_id=annotation.id, user_id=user_id))
+    release_evaluation_reservation(user_id, annotation.id)
+
+
+def leaderboard(user_id: str, rng: random.Random) -> None:
+    get_leaderboard_counts()
+
+
+OPERATIONS: dict[str, Callable[[str, random.Random], None]] = {
+    "annotate": annotate,
+    "evaluate": evaluate,
+    "leaderboard": leaderboard,
+}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}, use {', '.join(OPERATIONS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+def run_users(
+    user_ids: list[str],
+    mix: dict[str, float],
+    duration: float,
+    think_time: float,
+    seed_value: int,
+) -> dict[str, list]:
+    """Run one thread per user until duration is up.
+
+    :return: latencies in seconds per operation, plus error counts under "errors"
+    """
+    results: dict[str, list] = defaultdict(list)
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names, weights = list(mix), list(mix.values())
+
+    def virtual_user(user_id: str, rng: random.Random) -> None:
+        latencies = defaultdict(list)
+        errors = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                with unit_of_work():
+                    OPERATIONS[name](user_id, rng)
+            except Exception as e:
+                errors.append(f"{name}: {type(e).__name__}: {e}")
+            else:
+                latencies[name].append(time.perf_counter() - start)
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+        with results_lock:
+            for name, values in latencies.items():
+                results[name].extend(values)
+            results["errors"].extend(errors)
+
+    threads = [
+        threading.Thread(
+            target=virtual_user, args=(user_id, random.Random(seed_value + i))
+        )
+        for i, user_id in enumerate(user_ids)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(results)
+
+
+def _run_in_process(queue, *args) -> None:
+    queue.put(run_users(*args))
+
+
+def report(results: dict[str, list], duration: float) -> None:
+    print(
+        f"{'operation':>12} {'count':>8} {'ops/s':>8} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    for name in OPERATIONS:
+        latencies = results.get(name, [])
+        if not latencies:
+            continue
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        else:
+            percentiles = latencies * 99
+        p50, p95, p99 = (percentiles[p - 1] * 1000 for p in (50, 95, 99))
+        print(
+            f"{name:>12} {len(latencies):>8} {len(latencies) / duration:>8.1f} "
+            f"{p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {max(latencies) * 1000:>9.1f}"
+        )
+    errors = results.get("errors", [])
+    if errors:
+        print(f"{len(errors)} errors, e.g. {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="Concurrent users.")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds.")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0,
+        help="Mean pause between a user's operations in seconds, 0 for none.",
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights.")
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="Create the tables and seed synthetic data if there are no synthetic "
+        "users with --prefix yet.",
+    )
+    parser.add_argument(
+        "--prefix", default="loadtest", help="Prefix of the synthetic user ids."
+    )
+    parser.add_argument("--seed-annotations", type=int, default=20_000)
+    parser.add_argument("--seed-evaluations", type=int, default=40_000)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    synthetic_users = select(User.id).where(
+        User.id.startswith(f"{args.prefix}-", autoescape=True)
+    )
+    if args.seed:
+        create_tables()
+        with get_session() as session:
+            is_seeded = session.exec(synthetic_users.limit(1)).first() is not None
+        if not is_seeded:
+            catalog = get_track_catalog()
+            seed_synthetic_data(
+                SyntheticData(
+                    n_users=max(args.users, 1_000),
+                    n_annotations=args.seed_annotations,
+                    n_evaluations=args.seed_evaluations,
+                    n_skipped=0,
+                    max_evaluations=get_evaluation_limit(),
+                    track_ids=np.asarray(catalog.ids),
+                    track_weights=catalog.weights,
+                    first_annotation_id=(max_annotation_id() or 0) + 1,
+                    prefix=args.prefix,
+                )
+            )
+    with get_session() as session:
+        user_ids = session.exec(synthetic_users.limit(args.users)).all()
+    if len(user_ids) < args.users:
+        raise SystemExit(
+            f"Only {len(user_ids)} synthetic users with the prefix {args.prefix!r}, "
+            "use --seed"
+        )
+
+    shares = [user_ids[i :: args.processes] for i in range(args.processes)]
+    run_args = [
+        (share, mix, args.duration, args.think_time, i * len(user_ids))
+        for i, share in enumerate(shares)
+    ]
+    if args.processes == 1:
+        results = run_users(*run_args[0])
+    else:
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        processes = [
+            context.Process(target=_run_in_process, args=(queue, *process_args))
+            for process_args in run_args
+        ]
+        for process in processes:
+            process.start()
+        results = defaultdict(list)
+        for _ in processes:
+            for name, values in queue.get().items():
+                results[name].extend(values)
+        for process in processes:
+            process.join()
+    report(results, args.duration)
+
+
+if __name__ == "__main__":
+    main()
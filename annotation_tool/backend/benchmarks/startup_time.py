@@ -0,0 +1,65 @@
+"""Break the cold start of the app down into module imports and warm-up steps.
+
+Everything is measured in a fresh process, in the order the app loads it, so a module
+is charged for the dependencies it is the first to import. Run from the project root:
+
+    python -m annotation_tool.backend.benchmarks.startup_time
+"""
+import argparse
+import importlib
+import multiprocessing
+import time
+
+MODULES = (
+    "streamlit",
+    "pandas",
+    "pyarrow",
+    "sqlalchemy",
+    "sqlmodel",
+    "annotation_tool.backend.models",
+    "annotation_tool.pages.welcome",
+    "annotation_tool.pages.user_page",
+    "annotation_tool.pages.profile_page",
+    "annotation_tool.pages.annotation_page",
+    "annotation_tool.pages.evaluation_page",
+    "annotation_tool.app",
+)
+
+
+def measure(queue) -> None:
+    timings = []
+    for module in MODULES:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        timings.append(("import " + module, time.perf_counter() - start))
+
+    from annotation_tool.backend.startup import warm_up
+
+    timings += [("warm up " + step, seconds) for step, seconds in warm_up().items()]
+    queue.put(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(args.repeat):
+        queue = context.Queue()
+        process = context.Process(target=measure, args=(queue,))
+        process.start()
+        runs.append(queue.get())
+        process.join()
+
+    print(f"{'step':<50} {'median ms':>10}")
+    for i, (step, _) in enumerate(runs[0]):
+        seconds = sorted(run[i][1] for run in runs)[len(runs) // 2]
+        print(f"{step:<50} {seconds * 1000:>10.1f}")
+    totals = sorted(sum(seconds for _, seconds in run) for run in runs)
+    print(f"{'total':<50} {totals[len(totals) // 2] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
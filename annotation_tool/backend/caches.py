@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import (
+    AbstractSet,
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TrackAnnotationCounter:
+    """In-process annotation counts per track.
+
+    Loaded once from the database and incremented whenever an annotation is added,
+    so the set of tracks at the annotation limit can be read in constant time. The
+    saturated sets are kept per limit and replaced (not mutated) on change, which lets
+    the sampler skip re-applying a set it has already seen.
+    """
+
+    def __init__(self, counts: Optional[Mapping[int, int]] = None):
+        self._counts: Counter[int] = Counter()
+        self._saturated: dict[int, frozenset[int]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._missed = 0  # increments while not loaded
+        self.is_loaded = False
+        if counts is not None:
+            self.load(counts)
+
+    def __getitem__(self, track_id: int) -> int:
+        return self._counts[track_id]
+
+    def load(self, counts: Mapping[int, int]) -> None:
+        with self._lock:
+            self._counts = Counter(counts)
+            self._saturated.clear()
+            self.is_loaded = True
+
+    def load_from(self, query: Callable[[], Mapping[int, int]]) -> None:
+        """Load the counts from query unless they are loaded already, one loader at a
+        time. If an annotation is counted while the query runs, the result may or may
+        not include it, so the query is run again."""
+        with self._load_lock:
+            while not self.is_loaded:
+                with self._lock:
+                    self._missed = 0
+                counts = query()
+                with self._lock:
+                    if not self._missed:
+                        self._counts = Counter(counts)
+                        self._saturated.clear()
+                        self.is_loaded = True
+
+    def increment(self, track_id: int) -> None:
+        with self._lock:
+            if not self.is_loaded:
+                self._missed += 1  # part of the counts once (re)loaded
+                return
+            self._counts[track_id] += 1
+            count = self._counts[track_id]
+            for limit, saturated in self._saturated.items():
+                if count == limit:
+                    self._saturated[limit] = saturated | {track_id}
+
+    def saturated(self, limit: int) -> AbstractSet[int]:
+        """Return the ids of all tracks with at least `limit` annotations."""
+        if (saturated := self._saturated.get(limit)) is not None:
+            return saturated
+        with self._lock:
+            saturated = frozenset(
+                track_id for track_id, count in self._counts.items() if count >= limit
+            )
+            self._saturated[limit] = saturated
+        return saturated
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe mapping that evicts the least recently used entry beyond maxsize."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+        # in-flight loads per key, and how often keys being loaded were changed
+        self._loads: dict[K, int] = {}
+        self._changes: dict[K, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def get_or_load(self, key: K, load: Callable[[], V]) -> V:
+        """Return the cached value or load, store and return it on a miss.
+
+        If the key is updated or popped while it is being loaded, the load may or may
+        not include that change, so its value is dropped and loaded again.
+        """
+        while True:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    return self._data[key]
+                self._loads[key] = self._loads.get(key, 0) + 1
+                changes = self._changes.get(key, 0)
+            try:
+                value = load()
+            finally:
+                with self._lock:
+                    is_changed = self._changes.get(key, 0) != changes
+                    self._loads[key] -= 1
+                    if not self._loads[key]:
+                        del self._loads[key]
+                        self._changes.pop(key, None)
+            if not is_changed:
+                with self._lock:
+                    self._store(key, value)
+                return value
+
+    def update_if_present(self, key: K, func: Callable[[V], V]) -> None:
+        """Replace a cached value with func(value); missing keys stay missing so they
+        are loaded fresh from the database on the next read."""
+        with self._lock:
+            if key in self._data:
+                self._data[key] = func(self._data[key])
+            else:
+                self._mark_changed(key)
+
+    def pop(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._mark_changed(key)
+
+    def _store(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _mark_changed(self, key: K) -> None:
+        if key in self._loads:
+            self._changes[key] = self._changes.get(key, 0) + 1
+
+
+class LeaderboardSummary:
+    """Materialized per-user annotation and evaluation counts for one date range.
+
+    Built from a single database read and incremented on every write in between, so
+    showing the leaderboard does not touch the database until the summary is older than
+    ttl seconds and gets rebuilt to pick up writes from other processes.
+    """
+
+    def __init__(
+        self,
+        rows: Iterable[tuple[str, Optional[str], int, int]],
+        start: datetime,
+        end: datetime,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """:param rows: (user_id, nickname, annotation count, evaluation count)"""
+        self.start = start
+        self.end = end
+        self._expires = clock() + ttl
+        self._clock = clock
+        self._entries = {
+            user_id: [nickname, annotations, evaluations]
+            for user_id, nickname, annotations, evaluations in rows
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._clock() >= self._expires
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._entries
+
+    def add(
+        self,
+        user_id: str,
+        nickname: Optional[str],
+        timestamp: datetime,
+        annotations: int = 0,
+        evaluations: int = 0,
+    ) -> None:
+        if not self.start <= timestamp <= self.end:
+            return
+        with self._lock:
+            entry = self._entries.setdefault(user_id, [nickname, 0, 0])
+            entry[1] += annotations
+            entry[2] += evaluations
+
+    def set_nickname(self, user_id: str, nickname: Optional[str]) -> None:
+        with self._lock:
+            if user_id in self._entries:
+                self._entries[user_id][0] = nickname
+
+    def rows(self) -> list[tuple[Optional[str], int, int]]:
+        """:return: (nickname, annotation count, evaluation count) per user"""
+        with self._lock:
+            return [tuple(entry) for entry in self._entries.values()]
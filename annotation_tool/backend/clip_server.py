@@ -0,0 +1,128 @@
+"""Serve the cached track clips over HTTP, with Range support.
+
+Clips are served at /clips/<track id>.mp3 and transcoded into the cache on the first
+request (see clips.py). They never change for a given track id, so responses can be
+cached by the browser for good. Run from the project root next to the app, e.g.:
+
+    python -m annotation_tool.backend.clip_server --port 8502
+
+and set `clip_url = "http://<host>:8502/clips"` in the [audio] section of secrets.toml.
+"""
+import argparse
+import logging
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from annotation_tool.backend.clips import ClipStore, get_clip_store
+
+CLIP_PATH = re.compile(r"^/clips/(\d+)\.mp3$")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Parse a single-range Range header into inclusive (start, end) byte offsets.
+
+    :return: None for a missing or unsupported header (serve the whole file)
+    :raises ValueError: if the range cannot be satisfied
+    """
+    if header is None or not (match := RANGE.match(header.strip())):
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:  # the last `end` bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class ClipRequestHandler(BaseHTTPRequestHandler):
+    # keep-alive, players issue several range requests per clip when seeking
+    protocol_version = "HTTP/1.1"
+    store: ClipStore
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        match = CLIP_PATH.match(self.path.split("?", 1)[0])
+        if match is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        try:
+            clip = self.store.get(int(match.group(1)))
+        except Exception:
+            logging.exception(f"Could not make clip for {self.path}")
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        if clip is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        size = clip.stat().st_size
+        try:
+            byte_range = parse_range(self.headers.get("Range"), size)
+        except ValueError:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = byte_range if byte_range is not None else (0, size - 1)
+        if byte_range is None:
+            self.send_response(HTTPStatus.OK)
+        else:
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if send_body:
+            self._copy(clip, start, end - start + 1)
+
+    def _copy(self, clip: Path, start: int, length: int) -> None:
+        with clip.open("rb") as source:
+            source.seek(start)
+            try:
+                while length > 0:
+                    chunk = source.read(min(CHUNK_SIZE, length))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    length -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the player seeked or the page was closed
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+def serve(store: ClipStore, host: str = "", port: int = 8502) -> None:
+    handler = type("Handler", (ClipRequestHandler,), {"store": store})
+    with ThreadingHTTPServer((host, port), handler) as server:
+        logging.info(f"Serving clips from {store.cache_dir} on port {port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(get_clip_store(), args.host, args.port)
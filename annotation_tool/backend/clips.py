@@ -0,0 +1,110 @@
+"""Pre-trimmed audio clips of the catalog tracks, cached on disk.
+
+Clips are cut from a local copy of the MTG-Jamendo MP3s, laid out like the PATH column
+of autotagging-test.tsv (`<track id % 100>/<track id>.mp3`), and stored under the same
+layout in the cache directory. Trimming and encoding is done by ffmpeg.
+"""
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from annotation_tool.backend.config import get_clip_store_options
+from annotation_tool.backend.music import TrackId
+from annotation_tool.backend.utils import locked_singleton
+
+PathLike = Union[str, os.PathLike]
+
+
+def track_path(track_id: TrackId, suffix: str = ".mp3") -> Path:
+    """Relative path of a track in the MTG-Jamendo layout, e.g. 14/214.mp3."""
+    return Path(f"{track_id % 100:02d}") / f"{track_id}{suffix}"
+
+
+def transcode_clip(
+    source: PathLike,
+    target: PathLike,
+    duration: int = 120,
+    bitrate: str = "128k",
+    ffmpeg: str = "ffmpeg",
+) -> None:
+    """Write the first `duration` seconds of source to target as an MP3.
+
+    The clip is written to a temporary file next to target and moved into place, so
+    readers never see a partial clip.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".part.mp3")
+    os.close(fd)
+    try:
+        command = [ffmpeg, "-nostdin", "-v", "error", "-y", "-i", str(source)]
+        command += ["-t", str(duration), "-map", "0:a:0", "-map_metadata", "-1"]
+        command += ["-codec:a", "libmp3lame", "-b:a", bitrate, tmp_path]
+        subprocess.run(command, check=True, capture_output=True)
+        os.replace(tmp_path, target)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class ClipStore:
+    """Disk cache of fixed-length clips keyed by track id.
+
+    A clip missing from the cache is transcoded from the source directory on first
+    request; concurrent requests for the same track wait for one transcode.
+    """
+
+    def __init__(
+        self,
+        cache_dir: PathLike = "data/clips",
+        source_dir: Optional[PathLike] = None,
+        duration: int = 120,
+        bitrate: str = "128k",
+        ffmpeg: str = "ffmpeg",
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.source_dir = Path(source_dir) if source_dir is not None else None
+        self.duration = duration
+        self.bitrate = bitrate
+        self.ffmpeg = ffmpeg
+        self._locks: dict[TrackId, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def clip_path(self, track_id: TrackId) -> Path:
+        return self.cache_dir / track_path(track_id)
+
+    def source_path(self, track_id: TrackId) -> Optional[Path]:
+        if self.source_dir is None:
+            return None
+        return self.source_dir / track_path(track_id)
+
+    def get(self, track_id: TrackId) -> Optional[Path]:
+        """Return the path of the track's clip, transcoding it if needed.
+
+        :return: the clip path, or None if the clip is not cached and there is no
+            source file to make it from
+        """
+        clip = self.clip_path(track_id)
+        if clip.exists():
+            return clip
+        source = self.source_path(track_id)
+        if source is None or not source.exists():
+            return None
+        with self._lock_for(track_id):
+            if not clip.exists():
+                logging.info(f"Transcoding clip of track {track_id}")
+                transcode_clip(source, clip, self.duration, self.bitrate, self.ffmpeg)
+        return clip
+
+    def _lock_for(self, track_id: TrackId) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(track_id, threading.Lock())
+
+
+@locked_singleton
+def get_clip_store() -> ClipStore:
+    return ClipStore(**get_clip_store_options())
@@ -4,6 +4,31 @@ from typing import Optional
 import streamlit as st
 
 
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping")
+CLIP_OPTIONS = ("source_dir", "cache_dir", "duration", "bitrate", "ffmpeg")
+
+
+def get_db_pool_options() -> dict:
+    """Connection pool settings from the [db] section of secrets.toml.
+
+    Only what is configured is returned: SQLite's default pool rejects the size options.
+    """
+    db_config = st.secrets["db"]
+    return {key: db_config[key] for key in POOL_OPTIONS if key in db_config}
+
+
+def get_write_behind_options() -> Optional[dict]:
+    """Settings of the write-behind queue from the [db] section of secrets.toml, see
+    WriteBehindQueue, or None if `write_behind` is not enabled."""
+    db_config = st.secrets["db"]
+    if not db_config.get("write_behind", False):
+        return None
+    return {
+        "max_delay": db_config.get("write_behind_delay", 0.005),
+        "max_batch": db_config.get("write_behind_batch", 100),
+    }
+
+
 @st.experimental_singleton
 def get_track_tsv_file():
     default_tsv = "data/pilot_tracks.tsv"
@@ -13,6 +38,16 @@ def get_track_tsv_file():
         return default_tsv
 
 
+@st.experimental_singleton
+def get_catalog_file():
+    """The compiled catalog written by scripts/build_catalog.py, used if it exists."""
+    default_catalog = "data/catalog.arrow"
+    if music_config := st.secrets.get("music"):
+        return music_config.get("catalog_file", default_catalog)
+    else:
+        return default_catalog
+
+
 @st.experimental_singleton
 def get_annotation_limit():
     return _get_limit("annotation", default_limit=5)
@@ -23,6 +58,109 @@ def get_evaluation_limit():
     return _get_limit("evaluation", default_limit=3)
 
 
+@st.experimental_singleton
+def get_annotation_lease_ttl():
+    """Seconds a track stays reserved for an annotator."""
+    return _get_limit("annotation_lease_ttl", default_limit=1800)
+
+
+@st.experimental_singleton
+def get_evaluation_lease_ttl():
+    """Seconds an annotation stays reserved for an evaluator."""
+    return _get_limit("evaluation_lease_ttl", default_limit=900)
+
+
+@st.experimental_singleton
+def get_user_cache_size():
+    """Number of users whose data is kept in the in-process caches."""
+    if cache_config := st.secrets.get("cache"):
+        return cache_config.get("users", 1024)
+    else:
+        return 1024
+
+
+@st.experimental_singleton
+def get_leaderboard_ttl():
+    """Seconds before the cached leaderboard is rebuilt from the database."""
+    if leaderboard_config := st.secrets.get("leaderboard"):
+        return leaderboard_config.get("ttl", 300)
+    else:
+        return 300
+
+
+@st.experimental_singleton
+def get_clip_url() -> Optional[str]:
+    """Public base URL of the clip server, if tracks are played from it."""
+    if audio_config := st.secrets.get("audio"):
+        return audio_config.get("clip_url")
+    else:
+        return None
+
+
+def get_clip_store_options() -> dict:
+    """Clip store settings from the [audio] section of secrets.toml, see ClipStore."""
+    audio_config = st.secrets.get("audio", {})
+    return {key: audio_config[key] for key in CLIP_OPTIONS if key in audio_config}
+
+
+@st.experimental_singleton
+def is_metrics_enabled() -> bool:
+    if metrics_config := st.secrets.get("metrics"):
+        return bool(metrics_config.get("enabled", False))
+    else:
+        return False
+
+
+@st.experimental_singleton
+def get_metrics_port() -> Optional[int]:
+    """Port to serve the metrics on in the Prometheus text format, if any."""
+    if metrics_config := st.secrets.get("metrics"):
+        return metrics_config.get("port")
+    else:
+        return None
+
+
+@st.experimental_singleton
+def get_metrics_host() -> str:
+    """Address to serve the metrics on. They include SQL statement text and are served
+    without authentication, so only on the loopback interface unless configured."""
+    if metrics_config := st.secrets.get("metrics"):
+        return metrics_config.get("host", "127.0.0.1")
+    else:
+        return "127.0.0.1"
+
+
+@st.experimental_singleton
+def get_metrics_admins() -> frozenset[str]:
+    """Ids of the users who can see the metrics page."""
+    if metrics_config := st.secrets.get("metrics"):
+        return frozenset(metrics_config.get("admins", []))
+    else:
+        return frozenset()
+
+
+def is_query_budget_enabled() -> bool:
+    """Track the statements of every script run, if there is a [query_budget] section."""
+    return bool(st.secrets.get("query_budget"))
+
+
+def get_query_budget(page: str) -> Optional[int]:
+    """Maximum number of SQL statements in one script run of the page, from the
+    [query_budget] section: the page's name as key, or `default`."""
+    if budget_config := st.secrets.get("query_budget"):
+        return budget_config.get(page, budget_config.get("default"))
+    else:
+        return None
+
+
+def is_query_budget_strict() -> bool:
+    """Raise instead of warning when a page exceeds its budget."""
+    if budget_config := st.secrets.get("query_budget"):
+        return bool(budget_config.get("strict", False))
+    else:
+        return False
+
+
 def _get_limit(key: str, default_limit):
     if music_config := st.secrets.get("limits"):
         return music_config.get(key, default_limit)
@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import Callable, Hashable, Optional
+
+
+class LeaseMap:
+    """In-process, time-limited reservations of items (tracks, annotations) by users.
+
+    Each item can be leased by several holders at once; a lease ends when it is
+    released or when its ttl runs out. Expired leases are reclaimed lazily whenever
+    the item is looked at, plus a full sweep at most every ttl seconds.
+
+    `lock` is re-entrant and can be held around a check-then-acquire sequence to make
+    it atomic with respect to other threads. Releases are remembered for a ttl, so a
+    check can tell whether a lease was released after a point in time, e.g. after
+    the item's counts were read from the database.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self._clock = clock
+        self._leases: dict[Hashable, dict[str, float]] = {}
+        self._released: dict[Hashable, float] = {}
+        self._last_sweep = clock()
+
+    def __len__(self) -> int:
+        """Number of items with at least one active lease."""
+        return len(self.keys())
+
+    def count(self, key: Hashable, exclude_holder: Optional[str] = None) -> int:
+        """Number of active leases on key, not counting the one of exclude_holder."""
+        with self.lock:
+            holders = self._active_holders(key)
+            return len(holders) - (exclude_holder in holders)
+
+    def keys(self) -> list[Hashable]:
+        """All items with at least one active lease."""
+        with self.lock:
+            return [key for key in list(self._leases) if self._active_holders(key)]
+
+    def now(self) -> float:
+        return self._clock()
+
+    def released_since(self, key: Hashable, since: float) -> bool:
+        """Whether a lease on key was released at or after `since`, a value of now().
+
+        Releases are only remembered for a ttl, anything older counts as released.
+        """
+        with self.lock:
+            if self._clock() - since >= self.ttl:
+                return True
+            return self._released.get(key, float("-inf")) >= since
+
+    def holds(self, key: Hashable, holder: str) -> bool:
+        with self.lock:
+            return holder in self._active_holders(key)
+
+    def acquire(self, key: Hashable, holder: str) -> None:
+        """Lease key to holder, or extend the holder's lease if it has one."""
+        with self.lock:
+            self._maybe_sweep()
+            self._leases.setdefault(key, {})[holder] = self._clock() + self.ttl
+
+    def release(self, key: Hashable, holder: str) -> None:
+        with self.lock:
+            holders = self._leases.get(key)
+            if holders is not None:
+                if holders.pop(holder, None) is not None:
+                    self._released[key] = self._clock()
+                if not holders:
+                    del self._leases[key]
+
+    def _active_holders(self, key: Hashable) -> dict[str, float]:
+        holders = self._leases.get(key)
+        if holders is None:
+            return {}
+        now = self._clock()
+        for holder in [h for h, expires in holders.items() if expires <= now]:
+            del holders[holder]
+        if not holders:
+            del self._leases[key]
+        return holders
+
+    def _maybe_sweep(self) -> None:
+        now = self._clock()
+        if now - self._last_sweep < self.ttl:
+            return
+        self._last_sweep = now
+        for key in list(self._leases):
+            self._active_holders(key)
+        for key, released in list(self._released.items()):
+            if now - released >= self.ttl:
+                del self._released[key]
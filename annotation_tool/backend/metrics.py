@@ -0,0 +1,222 @@
+"""In-process timing histograms of the backend entry points and of every SQL statement.
+
+Disabled unless `enabled = true` is set in the [metrics] section of secrets.toml;
+while disabled, a timed function costs one attribute check and no SQLAlchemy event
+listeners are registered. The histograms are shown on the admin-only metrics page and
+rendered in the Prometheus text format, optionally served on `port` for scraping.
+"""
+import bisect
+import functools
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from annotation_tool.backend.config import (
+    get_metrics_host,
+    get_metrics_port,
+    is_metrics_enabled,
+)
+from annotation_tool.backend.utils import locked_singleton
+
+F = TypeVar("F", bound=Callable)
+
+# seconds; finer than Prometheus' defaults at the low end, most cached calls are < 1 ms
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+BUCKETS += (0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of observations per latency bucket, plus their sum."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Histograms per metric family and label value, safe to update from any thread."""
+
+    def __init__(self):
+        self.enabled = False
+        self._histograms: dict[str, dict[str, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, family: str, label: str, seconds: float) -> None:
+        with self._lock:
+            histograms = self._histograms.setdefault(family, {})
+            histogram = histograms.get(label)
+            if histogram is None:
+                histogram = histograms[label] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self, family: str) -> dict[str, Histogram]:
+        with self._lock:
+            return dict(self._histograms.get(family, {}))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for family, (label_name, help_text) in FAMILIES.items():
+                lines.append(f"# HELP {family} {help_text}")
+                lines.append(f"# TYPE {family} histogram")
+                for label, histogram in self._histograms.get(family, {}).items():
+                    labels = f'{label_name}="{_escape(label)}"'
+                    cumulative = 0
+                    bounds = [*map(str, histogram.buckets), "+Inf"]
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        bucket = f'{family}_bucket{{{labels},le="{bound}"}}'
+                        lines.append(f"{bucket} {cumulative}")
+                    lines.append(f"{family}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{family}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+OPERATION_SECONDS = "song_describer_operation_seconds"
+SQL_SECONDS = "song_describer_sql_seconds"
+FAMILIES = {
+    OPERATION_SECONDS: ("operation", "Wall time of backend entry points."),
+    SQL_SECONDS: ("statement", "Execution time of SQL statements, per statement."),
+}
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(operation: str) -> Callable[[F], F]:
+    """Record the wall time of every call in the operation's histogram."""
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                REGISTRY.observe(OPERATION_SECONDS, operation, seconds)
+
+        return wrapper
+
+    return decorator
+
+
+def statement_label(statement: str, max_length: int = 160) -> str:
+    """Collapse whitespace so that one parameterized statement is one label."""
+    label = re.sub(r"\s+", " ", statement).strip()
+    return label if len(label) <= max_length else label[: max_length - 3] + "..."
+
+
+# the start time is kept on the statement's execution context, so a statement that
+# fails cannot leave it behind for the next one on the connection
+_START_TIME = "_metrics_start_time"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    if context is not None:
+        setattr(context, _START_TIME, time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    _observe_statement(context, statement)
+
+
+def _handle_error(exception_context):
+    """Failed statements are timed too, they are often the slow ones (timeouts)."""
+    _observe_statement(
+        exception_context.execution_context, exception_context.statement
+    )
+
+
+def _observe_statement(context, statement: Optional[str]) -> None:
+    start_time = getattr(context, _START_TIME, None)
+    if start_time is not None and statement is not None:
+        delattr(context, _START_TIME)
+        seconds = time.perf_counter() - start_time
+        REGISTRY.observe(SQL_SECONDS, statement_label(statement), seconds)
+
+
+def enable() -> None:
+    """Start recording; SQL statements are timed on every engine from now on."""
+    if not REGISTRY.enabled:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        REGISTRY.enabled = True
+
+
+def disable() -> None:
+    if REGISTRY.enabled:
+        REGISTRY.enabled = False
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.remove(Engine, "handle_error", _handle_error)
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = REGISTRY.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@locked_singleton
+def setup_metrics() -> Optional[ThreadingHTTPServer]:
+    """Enable the metrics once per process if configured, and serve them for
+    scraping if a port is configured.
+
+    :return: the running metrics server, if any
+    """
+    if not is_metrics_enabled():
+        return None
+    enable()
+    port = get_metrics_port()
+    if port is None:
+        return None
+    host = get_metrics_host()
+    server = ThreadingHTTPServer((host, port), _PrometheusHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Serving metrics on {host}:{port}")
+    return server
+
+
+def _escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,35 +1,119 @@
+import atexit
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date, datetime
-from typing import Optional, List, Union, Tuple
+from typing import AbstractSet, Iterator, Optional, List, Union, Tuple
 
 import streamlit as st
-from sqlalchemy import func, text, not_
-from sqlalchemy.orm import aliased
-from sqlalchemy_utils import database_exists, create_database
+from sqlalchemy import (
+    Index,
+    Integer,
+    cast,
+    event,
+    func,
+    text,
+    not_,
+    inspect,
+    literal,
+    union_all,
+    update,
+)
 from sqlmodel import Field, SQLModel, Session, create_engine, select, Relationship
 
+from annotation_tool.backend.caches import (
+    LeaderboardSummary,
+    LRUCache,
+    TrackAnnotationCounter,
+)
+from annotation_tool.backend import aio
+from annotation_tool.backend.config import (
+    get_annotation_lease_ttl,
+    get_db_pool_options,
+    get_evaluation_lease_ttl,
+    get_leaderboard_ttl,
+    get_user_cache_size,
+    get_write_behind_options,
+)
+from annotation_tool.backend.leases import LeaseMap
+from annotation_tool.backend.metrics import timed
 from annotation_tool.backend.music import (
     get_track_info,
     Track,
+    TrackId,
     get_random_track_with_weights,
+    get_random_tracks_with_weights,
 )
+from annotation_tool.backend.utils import locked_singleton
+from annotation_tool.backend.write_behind import WriteBehindQueue
 
 
-def get_session():
-    engine = get_engine()
-    return Session(engine)
+_unit_of_work_session: ContextVar[Optional[Session]] = ContextVar(
+    "unit_of_work_session", default=None
+)
+
+
+def _new_session() -> Session:
+    # objects outlive their session, e.g. in st.session_state, so keep them loaded
+    return Session(get_engine(), expire_on_commit=False)
+
+
+@contextmanager
+def get_session() -> Iterator[Session]:
+    """Yield the session of the current unit of work, or a new one that is closed on
+    exit if there is none."""
+    session = _unit_of_work_session.get()
+    if session is not None:
+        yield session
+    else:
+        with _new_session() as session:
+            yield session
 
 
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    """Share one session between all model calls inside the block, e.g. one Streamlit
+    script run, so they reuse one pooled connection and the identity map.
+
+    Nested calls join the outer unit of work.
+    """
+    if (session := _unit_of_work_session.get()) is not None:
+        yield session
+        return
+    with _new_session() as session:
+        token = _unit_of_work_session.set(session)
+        try:
+            yield session
+        finally:
+            _unit_of_work_session.reset(token)
+
+
+@timed("models.add_to_db")
 def add_to_db(obj: SQLModel) -> None:
+    """Insert or update a row and update the in-process caches.
+
+    New annotations, evaluations and skipped tracks go through the write-behind queue
+    if it is enabled: the caches are updated right away and the row is committed with
+    others shortly after, see wait_for_writes.
+    """
+    is_new = inspect(obj).transient
+    if is_new and isinstance(obj, WRITE_BEHIND_MODELS):
+        if (queue := get_write_queue()) is not None:
+            queue.submit(obj, key=obj.user_id)
+            _on_write(obj, is_new)
+            return
     with get_session() as session:
         session.add(obj)
-        session.commit()
-        session.refresh(obj)
+        try:
+            session.commit()
+        except Exception:
+            session.rollback()  # keep a shared session usable
+            raise
+    _on_write(obj, is_new)
 
 
 def get_all(cls) -> list:
-    engine = get_engine()
-    with Session(engine) as session:
+    with get_session() as session:
         results = session.exec(select(cls))  # type: ignore
         return results.all()
 
@@ -39,71 +123,122 @@ class Annotation(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     text: str
     familiarity: int
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    track_id: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
+    track_id: TrackId
 
-    user_id: str = Field(foreign_key="users.id")
+    user_id: str = Field(foreign_key="users.id", index=True)
     user: "User" = Relationship(back_populates="annotations")
 
     comments: str
 
     evaluations: List["Evaluation"] = Relationship(back_populates="annotation")
+    # maintained on insert of an Evaluation, see _increment_evaluation_count
+    evaluation_count: int = Field(default=0, index=True)
 
     @classmethod
     def get_annotations_for_evaluation(
         cls, user_id: str, max_evaluations: int
     ) -> Optional["Annotation"]:
-        """Select a random row filtered by user id that has fewer evaluations than a
-        specified limit.
+        """Select and reserve a row filtered by user id that has fewer evaluations
+        than a specified limit, preferring the least evaluated annotations.
 
         Only annotations are selected that
           1) were not done by a specific user identified by user_id
-          2) have less than max_evaluations associated entries in the evaluation table
+          2) have less than max_evaluations associated entries in the evaluation table,
+             counting active reservations by other users
           3) are not already evaluated by the user
 
         :param user_id: the user id used to filter the annotations
         :param max_evaluations: the limit for the number of evaluations
         :return: An instance of Annotation or None
         """
-        engine = get_engine()
-        with Session(engine) as session:
-            evaluations_incomplete = (
-                select(Evaluation.annotation_id)
-                .group_by(Evaluation.annotation_id)
-                .having(func.count(Evaluation.id) < max_evaluations)
-            )
-            evaluations_alias = aliased(Evaluation)
-            evaluation_by_user = select(Evaluation).where(
-                Evaluation.user_id == user_id,
-                evaluations_alias.annotation_id == Evaluation.annotation_id,
-            )
-            evaluations_not_by_user = select(evaluations_alias.annotation_id).where(
-                not_(evaluation_by_user.exists()),  # not already evaluated by user
-                evaluations_alias.annotation_id.not_in(  # annotation not by user
-                    select(cls.id).where(cls.user_id == user_id)
-                ),
-            )
-            annotations_unevaluated_and_not_by_user = select(cls.id).where(
-                cls.user_id != user_id, cls.id.not_in(select(Evaluation.annotation_id))
-            )
-            results = session.exec(
-                annotations_unevaluated_and_not_by_user.union(
-                    evaluations_incomplete.intersect(evaluations_not_by_user)
-                ).limit(1)
+        annotations = cls.reserve_for_evaluation(user_id, max_evaluations, k=1)
+        return annotations[0] if annotations else None
+
+    @classmethod
+    @timed("models.Annotation.reserve_for_evaluation")
+    def reserve_for_evaluation(
+        cls, user_id: str, max_evaluations: int, k: int
+    ) -> list["Annotation"]:
+        """Select up to k annotations for a user to evaluate and reserve them.
+
+        Reserved annotations count towards max_evaluations for everyone else until the
+        reservation is released or expires, so concurrent evaluators are spread over
+        different annotations instead of all getting the least evaluated one.
+
+        :param user_id: the evaluating user
+        :param max_evaluations: the limit for the number of evaluations
+        :param k: the maximum number of annotations to reserve
+        :return: a list of Annotations, least evaluated first
+        """
+        leases = get_evaluation_leases()
+        statement = cls.select_evaluation_candidates(user_id, max_evaluations)
+        reserved = []
+        reserved_ids = set()
+        while True:
+            # everyone's queued evaluations, so that evaluation_count is not behind
+            wait_for_writes()
+            fetched_at = leases.now()
+            # over-fetch by the number of reserved annotations so that k unreserved
+            # candidates are in the result whenever they exist
+            with get_session() as session:
+                candidates = session.exec(
+                    statement.limit(k + len(leases)).execution_options(
+                        # the unit of work's identity map may hold older counts
+                        populate_existing=True
+                    )
+                ).all()
+            is_stale = False
+            with leases.lock:
+                for annotation in candidates:
+                    if len(reserved) == k:
+                        break
+                    if annotation.id in reserved_ids:
+                        continue  # reserved in an earlier pass
+                    # an evaluation's lease is released once it is committed, so
+                    # its evaluation_count may not include it: fetch again
+                    if leases.released_since(annotation.id, fetched_at):
+                        is_stale = True
+                        continue
+                    reservations = leases.count(annotation.id, exclude_holder=user_id)
+                    if annotation.evaluation_count + reservations < max_evaluations:
+                        leases.acquire(annotation.id, user_id)
+                        reserved.append(annotation)
+                        reserved_ids.add(annotation.id)
+            if len(reserved) == k or not is_stale:
+                break
+        return reserved
+
+    @classmethod
+    def select_evaluation_candidates(cls, user_id: str, max_evaluations: int):
+        """Build the query for annotations the user may evaluate, least evaluated first.
+
+        Uses the maintained evaluation_count column instead of aggregating the
+        evaluations table and a single anti-join on evaluations(annotation_id, user_id)
+        to drop annotations the user has already evaluated.
+        """
+        evaluated_by_user = select(Evaluation.id).where(
+            Evaluation.annotation_id == cls.id, Evaluation.user_id == user_id
+        )
+        return (
+            select(cls)
+            .where(
+                cls.evaluation_count < max_evaluations,
+                cls.user_id != user_id,
+                not_(evaluated_by_user.exists()),
             )
-            maybe_annotation_id = results.scalar_one_or_none()
-            if maybe_annotation_id is not None:
-                results = session.exec(select(cls).where(cls.id == maybe_annotation_id))
-                return results.one()
-            else:
-                return None
+            .order_by(cls.evaluation_count, cls.id)
+        )
 
 
 class Evaluation(SQLModel, table=True):
     __tablename__: str = "evaluations"
+    __table_args__ = (
+        Index("ix_evaluations_annotation_id_user_id", "annotation_id", "user_id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     rating: int
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     annotation_id: int = Field(foreign_key="annotations.id")
     annotation: Annotation = Relationship(back_populates="evaluations")
@@ -112,10 +247,20 @@ class Evaluation(SQLModel, table=True):
     user: "User" = Relationship(back_populates="evaluations")
 
 
+@event.listens_for(Evaluation, "after_insert")
+def _increment_evaluation_count(mapper, connection, target: Evaluation):
+    """Bump Annotation.evaluation_count in the same transaction as the evaluation."""
+    connection.execute(
+        update(Annotation)
+        .where(Annotation.id == target.annotation_id)
+        .values(evaluation_count=Annotation.evaluation_count + 1)
+    )
+
+
 class SkippedTrack(SQLModel, table=True):
     __tablename__: str = "skippedtracks"
     id: Optional[int] = Field(default=None, primary_key=True)
-    track_id: str
+    track_id: TrackId
     user_id: str = Field(foreign_key="users.id")
     comments: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
@@ -138,97 +283,389 @@ class User(SQLModel, table=True):
     evaluations: list[Evaluation] = Relationship(back_populates="user")
 
     @classmethod
+    @timed("models.User.get_by_id")
     def get_by_id(cls, _id) -> Optional["User"]:
+        # Session.get answers from the identity map if the user was already loaded
+        # in the current unit of work
         with get_session() as session:
-            results = session.exec(select(cls).where(cls.id == _id))
-            return results.one_or_none()
+            return session.get(cls, _id)
 
     def get_all_seen_track_ids(self):
-        annotated = select(Annotation.track_id).where(Annotation.user_id == self.id)
-        skipped = select(SkippedTrack.track_id).where(SkippedTrack.user_id == self.id)
-        with get_session() as session:
-            results = session.exec(annotated.union(skipped))
-            return results.scalars().all()
+        return _query_seen_track_ids(self.id)
 
     def get_annotation_count(self):
-        annotated_count = select(func.count(Annotation.track_id)).where(
-            Annotation.user_id == self.id
-        )
-        with get_session() as session:
-            result = session.exec(annotated_count)
-            return result.one()
+        return _query_user_annotation_count(self.id)
+
+
+def select_seen_track_ids(user_id: str):
+    annotated = select(Annotation.track_id).where(Annotation.user_id == user_id)
+    skipped = select(SkippedTrack.track_id).where(SkippedTrack.user_id == user_id)
+    return annotated.union(skipped)
+
+
+@timed("models._query_seen_track_ids")
+def _query_seen_track_ids(user_id: str) -> list[TrackId]:
+    wait_for_writes(user_id)
+    with get_session() as session:
+        results = session.exec(select_seen_track_ids(user_id))
+        return results.scalars().all()
+
+
+@locked_singleton
+def get_seen_track_cache() -> LRUCache[str, frozenset[TrackId]]:
+    return LRUCache(maxsize=get_user_cache_size())
 
 
+@timed("models.get_seen_track_ids")
+def get_seen_track_ids(user_id: str) -> frozenset[TrackId]:
+    """Return the ids of all tracks a user has annotated or skipped.
+
+    Loaded from the database once per user and kept up to date by add_to_db.
+    """
+    return get_seen_track_cache().get_or_load(
+        user_id, lambda: frozenset(_query_seen_track_ids(user_id))
+    )
+
+
+@timed("models._query_user_annotation_count")
+def _query_user_annotation_count(user_id: str) -> int:
+    annotated_count = select(func.count(Annotation.track_id)).where(
+        Annotation.user_id == user_id
+    )
+    wait_for_writes(user_id)
+    with get_session() as session:
+        result = session.exec(annotated_count)
+        return result.one()
+
+
+@locked_singleton
+def get_user_annotation_count_cache() -> LRUCache[str, int]:
+    return LRUCache(maxsize=get_user_cache_size())
+
+
+@timed("models.get_user_annotation_count")
 def get_user_annotation_count(user_id: str) -> int:
-    user = User.get_by_id(user_id)
-    return user.get_annotation_count()
+    """Return the number of annotations of a user.
 
+    Counted with a single query the first time and then kept up to date by add_to_db.
+    """
+    return get_user_annotation_count_cache().get_or_load(
+        user_id, lambda: _query_user_annotation_count(user_id)
+    )
 
+
+ANNOTATION_SCORE_FACTOR = 5
+EVALUATION_SCORE_FACTOR = 1
+
+
+@timed("models.get_leaderboard_counts")
 def get_leaderboard_counts(
     start_date: Union[date, datetime, None] = datetime.min, end_date: Union[date, datetime, None] = datetime.max
 ):
+    return [
+        (nickname, annotations, evaluations)
+        for _, nickname, annotations, evaluations in _query_leaderboard_counts(
+            start_date, end_date
+        )
+    ]
+
+
+def select_leaderboard(
+    start_date: Union[date, datetime, None], end_date: Union[date, datetime, None]
+):
+    """Build one statement that counts annotations and evaluations per user within a
+    date range and ranks users by their weighted score."""
     annotation_counts = (
-        select(Annotation.user_id, User.nickname, func.count(Annotation.id))
-        .join(User)
-        .filter(Annotation.timestamp >= start_date, Annotation.timestamp <= end_date)
-        .group_by(
-            Annotation.user_id,
-            User.nickname,
+        select(
+            Annotation.user_id.label("user_id"),
+            func.count(Annotation.id).label("annotations"),
+            literal(0).label("evaluations"),
         )
+        .filter(Annotation.timestamp >= start_date, Annotation.timestamp <= end_date)
+        .group_by(Annotation.user_id)
     )
     evaluation_counts = (
-        select(Evaluation.user_id, User.nickname, func.count(Evaluation.id))
-        .join(User)
+        select(
+            Evaluation.user_id.label("user_id"),
+            literal(0).label("annotations"),
+            func.count(Evaluation.id).label("evaluations"),
+        )
         .filter(Evaluation.timestamp >= start_date, Evaluation.timestamp <= end_date)
-        .group_by(
-            Evaluation.user_id,
+        .group_by(Evaluation.user_id)
+    )
+    counts = union_all(annotation_counts, evaluation_counts).subquery()
+    # sum() of counts is numeric on Postgres, which psycopg2 returns as Decimal
+    annotations = cast(func.sum(counts.c.annotations), Integer)
+    evaluations = cast(func.sum(counts.c.evaluations), Integer)
+    score = ANNOTATION_SCORE_FACTOR * annotations + EVALUATION_SCORE_FACTOR * evaluations
+    return (
+        select(
+            User.id,
             User.nickname,
+            annotations.label("annotations"),
+            evaluations.label("evaluations"),
+            score.label("score"),
         )
+        .join(counts, counts.c.user_id == User.id)
+        .group_by(User.id, User.nickname)
+        .order_by(score.desc(), User.id)
     )
-    with get_session() as session:
-        annotations_results = session.exec(annotation_counts).all()
-        evaluations_results = session.exec(evaluation_counts).all()
-    annotation_counts = {user_id: count for user_id, _, count in annotations_results}
-    evaluation_counts = {user_id: count for user_id, _, count in evaluations_results}
-    annotation_nicknames = {
-        user_id: nickname for user_id, nickname, _ in annotations_results
-    }
-    evaluations_nicknames = {
-        user_id: nickname for user_id, nickname, _ in evaluations_results
-    }
-    all_nicknames = annotation_nicknames | evaluations_nicknames
-    results = [
-        (
-            all_nicknames[_id],
-            annotation_counts.get(_id, 0),
-            evaluation_counts.get(_id, 0),
+
+
+@timed("models.get_cached_leaderboard_counts")
+def get_cached_leaderboard_counts(
+    start_date: Union[date, datetime], end_date: Union[date, datetime]
+) -> list[tuple[Optional[str], int, int]]:
+    """Same as get_leaderboard_counts, served from an in-process LeaderboardSummary
+    that is updated on every write and rebuilt after get_leaderboard_ttl() seconds."""
+    start_date, end_date = _as_datetime(start_date), _as_datetime(end_date)
+    summaries = get_leaderboard_summaries()
+    summary = summaries.get((start_date, end_date))
+    if summary is None or summary.is_stale:
+        logging.info("Rebuilding leaderboard summary")
+        summary = LeaderboardSummary(
+            _query_leaderboard_counts(start_date, end_date),
+            start_date,
+            end_date,
+            ttl=get_leaderboard_ttl(),
         )
-        for _id in all_nicknames
-    ]
-    return results
+        summaries[(start_date, end_date)] = summary
+    return summary.rows()
+
+
+@locked_singleton
+def get_leaderboard_summaries() -> dict[tuple[datetime, datetime], LeaderboardSummary]:
+    return {}
 
 
+def _as_datetime(value: Union[date, datetime]) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, datetime.min.time())
+
+
+@timed("models._query_leaderboard_counts")
+def _query_leaderboard_counts(
+    start_date: Union[date, datetime, None], end_date: Union[date, datetime, None]
+) -> list[tuple[str, Optional[str], int, int]]:
+    """:return: (user_id, nickname, annotation count, evaluation count) per user"""
+    wait_for_writes()
+    with get_session() as session:
+        results = session.exec(select_leaderboard(start_date, end_date))
+        return [
+            (user_id, nickname, annotations, evaluations)
+            for user_id, nickname, annotations, evaluations, _ in results.all()
+        ]
+
+
+@timed("models.get_track_for_annotation")
 def get_track_for_annotation(
     user_id: str, annotation_limit: int = 5
 ) -> Optional[Track]:
-    user = User.get_by_id(user_id)
-    all_user_seen_tracks = user.get_all_seen_track_ids()
+    """Draw a track for a user to annotate and reserve it.
+
+    The reservation counts towards the annotation limit for other users until it is
+    released on submit/skip or expires, so concurrent users cannot push a track past
+    the limit.
+    """
+    _warm_track_assignment_caches(user_id)
+    leases = get_annotation_leases()
+    all_user_seen_tracks = get_seen_track_ids(user_id)
+    with leases.lock:
+        tracks_above_annotation_limit = get_tracks_at_annotation_limit(annotation_limit)
+        track = get_random_track_with_weights(
+            exclude=all_user_seen_tracks
+            | _get_tracks_reserved_to_limit(user_id, annotation_limit),
+            saturated=tracks_above_annotation_limit,
+        )
+        if track is not None:
+            leases.acquire(track.id, user_id)
+    return track
+
+
+@timed("models.get_tracks_for_annotation")
+def get_tracks_for_annotation(
+    user_id: str,
+    annotation_limit: int,
+    k: int,
+    exclude: AbstractSet[TrackId] = frozenset(),
+) -> list[Track]:
+    """Draw up to k distinct tracks for a user, e.g. to prefetch the next ones.
+
+    The tracks are not reserved, use reserve_track_for_annotation before showing one.
+
+    :param exclude: additional track ids to skip, e.g. tracks already prefetched
+    """
+    _warm_track_assignment_caches(user_id)
+    all_user_seen_tracks = get_seen_track_ids(user_id)
     tracks_above_annotation_limit = get_tracks_at_annotation_limit(annotation_limit)
-    return get_random_track_with_weights(
-        exclude=set(all_user_seen_tracks + tracks_above_annotation_limit)
+    with get_annotation_leases().lock:
+        reserved_to_limit = _get_tracks_reserved_to_limit(user_id, annotation_limit)
+    return get_random_tracks_with_weights(
+        k,
+        exclude=all_user_seen_tracks | reserved_to_limit | exclude,
+        saturated=tracks_above_annotation_limit,
+    )
+
+
+@timed("models.reserve_track_for_annotation")
+def reserve_track_for_annotation(
+    user_id: str, track_id: TrackId, annotation_limit: int
+) -> bool:
+    """Reserve a track for a user if it is still below the annotation limit (counting
+    other users' reservations) and the user has not seen it yet.
+
+    :return: True if the track is now reserved for the user
+    """
+    if track_id in get_seen_track_ids(user_id):
+        return False
+    leases = get_annotation_leases()
+    with leases.lock:
+        reservations = leases.count(track_id, exclude_holder=user_id)
+        if get_track_annotation_counter()[track_id] + reservations >= annotation_limit:
+            return False
+        leases.acquire(track_id, user_id)
+        return True
+
+
+def release_track_reservation(user_id: str, track_id: TrackId) -> None:
+    get_annotation_leases().release(track_id, user_id)
+
+
+@locked_singleton
+def get_annotation_leases() -> LeaseMap:
+    return LeaseMap(ttl=get_annotation_lease_ttl())
+
+
+def _get_tracks_reserved_to_limit(
+    user_id: str, annotation_limit: int
+) -> set[TrackId]:
+    """Tracks that reach the annotation limit when counting other users' reservations.
+
+    The caller must hold the annotation leases' lock.
+    """
+    leases = get_annotation_leases()
+    counter = get_track_annotation_counter()
+    return {
+        track_id
+        for track_id in leases.keys()
+        if counter[track_id] + leases.count(track_id, exclude_holder=user_id)
+        >= annotation_limit
+    }
+
+
+def get_tracks_at_annotation_limit(
+    annotation_limit: int,
+) -> AbstractSet[TrackId]:
+    return get_track_annotation_counter().saturated(annotation_limit)
+
+
+def select_track_annotation_counts():
+    return select(Annotation.track_id, func.count(Annotation.id)).group_by(
+        Annotation.track_id
     )
 
 
-def get_tracks_at_annotation_limit(annotation_limit: int) -> list[str]:
+@locked_singleton
+def _get_track_annotation_counter() -> TrackAnnotationCounter:
+    return TrackAnnotationCounter()
+
+
+def _query_track_annotation_counts() -> dict[TrackId, int]:
+    logging.info("Loading annotation counts per track")
+    wait_for_writes()
     with get_session() as session:
-        result = session.exec(
-            select(Annotation.track_id)
-            .group_by(Annotation.track_id)
-            .having(func.count(Annotation.id) >= annotation_limit)
+        return dict(session.exec(select_track_annotation_counts()).all())
+
+
+@timed("models.get_track_annotation_counter")
+def get_track_annotation_counter() -> TrackAnnotationCounter:
+    counter = _get_track_annotation_counter()
+    if not counter.is_loaded:
+        counter.load_from(_query_track_annotation_counts)
+    return counter
+
+
+def _warm_track_assignment_caches(user_id: str) -> None:
+    """Load a user's seen tracks and the per-track annotation counts concurrently on
+    the async engine if both are needed, instead of one after the other."""
+    counter = _get_track_annotation_counter()
+    seen_track_cache = get_seen_track_cache()
+    if counter.is_loaded or user_id in seen_track_cache or not aio.is_async_enabled():
+        return
+
+    # both go through the caches' load paths, which catch writes landing mid-load
+    def query_counts() -> dict[TrackId, int]:
+        counts = None
+
+        def load_seen_track_ids() -> frozenset[TrackId]:
+            nonlocal counts
+            wait_for_writes()
+            seen_track_ids, count_rows = aio.fetch_all_sync(
+                select_seen_track_ids(user_id), select_track_annotation_counts()
+            )
+            counts = dict(count_rows)
+            return frozenset(row[0] for row in seen_track_ids)
+
+        seen_track_cache.get_or_load(user_id, load_seen_track_ids)
+        if counts is None:  # the seen tracks were loaded in the meantime
+            return _query_track_annotation_counts()
+        return counts
+
+    counter.load_from(query_counts)
+
+
+def _on_write(obj: SQLModel, is_new: bool) -> None:
+    """Keep the in-process caches in sync with rows written through add_to_db."""
+    if isinstance(obj, User):
+        for summary in get_leaderboard_summaries().values():
+            summary.set_nickname(obj.id, obj.nickname)
+    if not is_new:
+        return
+    if isinstance(obj, Annotation):
+        # not loaded here: a cold counter would read the new row and count it twice
+        _get_track_annotation_counter().increment(obj.track_id)
+        get_user_annotation_count_cache().update_if_present(
+            obj.user_id, lambda count: count + 1
+        )
+    if isinstance(obj, (Annotation, SkippedTrack)):
+        get_seen_track_cache().update_if_present(
+            obj.user_id, lambda seen: seen | {obj.track_id}
+        )
+    if isinstance(obj, (Annotation, Evaluation)):
+        _add_to_leaderboard_summaries(obj)
+
+
+def _on_failed_write(obj: SQLModel, error: Exception) -> None:
+    """Drop what the caches learned from a queued row that could not be written, so
+    that it is reloaded from the database."""
+    get_seen_track_cache().pop(obj.user_id)
+    get_user_annotation_count_cache().pop(obj.user_id)
+    if isinstance(obj, Annotation):
+        _get_track_annotation_counter().is_loaded = False
+    get_leaderboard_summaries().clear()
+
+
+def _add_to_leaderboard_summaries(obj: Union[Annotation, Evaluation]) -> None:
+    summaries = list(get_leaderboard_summaries().values())
+    if not summaries:
+        return
+    nickname = None
+    if any(obj.user_id not in summary for summary in summaries):
+        user = User.get_by_id(obj.user_id)
+        nickname = user.nickname if user else None
+    is_annotation = isinstance(obj, Annotation)
+    for summary in summaries:
+        summary.add(
+            obj.user_id,
+            nickname,
+            obj.timestamp,
+            annotations=int(is_annotation),
+            evaluations=int(not is_annotation),
         )
-        return result.all()
 
 
+@timed("models.get_annotated_track_for_evaluation")
 def get_annotated_track_for_evaluation(
     user_id, max_evaluations=3
 ) -> Union[Tuple[Track, Annotation], Tuple[None, None]]:
@@ -237,14 +674,81 @@ def get_annotated_track_for_evaluation(
     return track, annotation
 
 
+@locked_singleton
+def get_evaluation_leases() -> LeaseMap:
+    return LeaseMap(ttl=get_evaluation_lease_ttl())
+
+
+@timed("models.reserve_evaluation_batch")
+def reserve_evaluation_batch(
+    user_id: str, k: int, max_evaluations: int = 3
+) -> list[Tuple[Track, Annotation]]:
+    """Select up to k annotations for a user to evaluate and reserve them, see
+    Annotation.reserve_for_evaluation.
+
+    :return: a list of (Track, Annotation) tuples, least evaluated first
+    """
+    batch = Annotation.reserve_for_evaluation(user_id, max_evaluations, k)
+    return [(get_track_info(annotation.track_id), annotation) for annotation in batch]
+
+
+def holds_evaluation_reservation(user_id: str, annotation_id: int) -> bool:
+    return get_evaluation_leases().holds(annotation_id, user_id)
+
+
+def release_evaluation_reservation(user_id: str, annotation_id: int) -> None:
+    """Release a user's reservation of an annotation.
+
+    While the user's evaluation is still in the write-behind queue, the reservation is
+    kept until it is committed: until then evaluation_count does not include it and
+    the reservation is what counts it towards the limit for other evaluators.
+    """
+    leases = get_evaluation_leases()
+    if (queue := get_write_queue()) is not None:
+        queue.when_written(user_id, lambda: leases.release(annotation_id, user_id))
+    else:
+        leases.release(annotation_id, user_id)
+
+
+WRITE_BEHIND_MODELS = (Annotation, Evaluation, SkippedTrack)
+
+
+@timed("models._write_batch")
+def _write_batch(objs: list[SQLModel]) -> None:
+    with _new_session() as session:
+        session.add_all(objs)
+        session.commit()
+
+
+@locked_singleton
+def get_write_queue() -> Optional[WriteBehindQueue[SQLModel]]:
+    """The process-wide write-behind queue, None if it is not enabled. It is drained
+    when the process exits."""
+    options = get_write_behind_options()
+    if options is None:
+        return None
+    queue = WriteBehindQueue(_write_batch, on_error=_on_failed_write, **options)
+    atexit.register(queue.close)
+    return queue
+
+
+def wait_for_writes(user_id: Optional[str] = None) -> None:
+    """Block until the queued writes of a user, or of everyone if user_id is None,
+    are committed, before reading them back from the database."""
+    if (queue := get_write_queue()) is not None:
+        queue.wait(user_id)
+
+
 @st.experimental_singleton
 def get_engine():
     logging.info("Creating DB engine")
-    engine = create_engine(st.secrets["db"]["url"])
+    engine = create_engine(st.secrets["db"]["url"], **get_db_pool_options())
     return engine
 
 
 def create_tables(db_user=None):
+    from sqlalchemy_utils import database_exists, create_database
+
     engine = get_engine()
     if not database_exists(engine.url):
         logging.info("Database does not exist, creating it")
@@ -269,6 +773,113 @@ def create_tables(db_user=None):
             sess.commit()
 
 
+def migrate_evaluation_counts():
+    """Add the evaluation_count column and the lookup indexes to existing tables and
+    backfill the counts from the evaluations table."""
+    engine = get_engine()
+    columns = {column["name"] for column in inspect(engine).get_columns("annotations")}
+    with engine.begin() as connection:
+        if "evaluation_count" not in columns:
+            logging.info("Adding annotations.evaluation_count")
+            connection.execute(
+                text(
+                    "ALTER TABLE annotations "
+                    "ADD COLUMN evaluation_count INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+        logging.info("Backfilling annotations.evaluation_count")
+        connection.execute(
+            text(
+                """
+                UPDATE annotations SET evaluation_count = (
+                    SELECT count(*) FROM evaluations
+                    WHERE evaluations.annotation_id = annotations.id
+                )
+                """
+            )
+        )
+    create_missing_indexes()
+
+
+def migrate_track_ids():
+    """Convert the track_id columns of annotations and skipped tracks from strings to
+    integers, normalizing ids stored as "track_0000214" on the way.
+
+    Postgres changes the column type in place. SQLite cannot, so there each table is
+    copied aside, recreated from the model and filled back, all in one transaction.
+    The tables must have all other columns of the models already, i.e. run
+    migrate_evaluation_counts first.
+    """
+    engine = get_engine()
+    tables = {}
+    for table in (Annotation.__table__, SkippedTrack.__table__):
+        columns = {
+            column["name"]: column["type"]
+            for column in inspect(engine).get_columns(table.name)
+        }
+        if isinstance(columns["track_id"], Integer):
+            logging.info(f"{table.name}.track_id is already an integer")
+            continue
+        missing = [name for name in table.columns.keys() if name not in columns]
+        if missing:
+            raise RuntimeError(
+                f"{table.name} has no column {', '.join(missing)} yet, run "
+                "migrate_evaluation_counts first"
+            )
+        copy = f"{table.name}_track_id_migration"
+        if inspect(engine).has_table(copy):
+            raise RuntimeError(
+                f"{copy} is left over from an earlier migration and may hold the only "
+                f"copy of rows of {table.name}; check and drop it first"
+            )
+        tables[table] = copy
+    as_integer = "CAST(replace(track_id, 'track_', '') AS INTEGER)"
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as connection:
+            for table in tables:
+                logging.info(f"Converting {table.name}.track_id to integers")
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ALTER COLUMN track_id TYPE INTEGER USING {as_integer}"
+                    )
+                )
+        return
+    # pysqlite commits before DDL statements by itself, so the transaction is begun
+    # on a connection it leaves alone
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("BEGIN")
+        try:
+            for table, copy in tables.items():
+                logging.info(f"Converting {table.name}.track_id to integers")
+                names = [column.name for column in table.columns]
+                values = [as_integer if name == "track_id" else name for name in names]
+                # not renamed: SQLite would point the evaluations' foreign key at it
+                connection.exec_driver_sql(
+                    f"CREATE TABLE {copy} AS SELECT * FROM {table.name}"
+                )
+                connection.exec_driver_sql(f"DROP TABLE {table.name}")
+                table.create(connection)
+                connection.exec_driver_sql(
+                    f"INSERT INTO {table.name} ({', '.join(names)}) "
+                    f"SELECT {', '.join(values)} FROM {copy}"
+                )
+                connection.exec_driver_sql(f"DROP TABLE {copy}")
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
+
+
+def create_missing_indexes():
+    """Create indexes that were added to the models after the tables were created."""
+    engine = get_engine()
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            logging.info(f"Creating index {index.name} if it does not exist")
+            index.create(engine, checkfirst=True)
+
+
 def delete_tables():
     engine = get_engine()
     logging.warning("Deleting tables!")
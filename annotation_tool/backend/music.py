@@ -1,71 +1,312 @@
+import logging
+import threading
 from dataclasses import dataclass
-from typing import Optional
+from pathlib import Path
+from typing import AbstractSet, Iterable, Optional, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 
-from annotation_tool.backend.config import get_track_tsv_file
+from annotation_tool.backend.config import (
+    get_catalog_file,
+    get_clip_url,
+    get_track_tsv_file,
+)
+from annotation_tool.backend.metrics import timed
+from annotation_tool.backend.sampling import WeightedSampler
 
 
-@dataclass(frozen=True)
+# Jamendo track id. The TSVs spell it 214, "214" or "track_0000214"; everything past
+# the loaders (catalog, database, caches, leases) uses the plain integer.
+TrackId = int
+
+
+def to_track_id(value: Union[int, str, np.integer]) -> TrackId:
+    """Normalize a track id as found in the TSVs to the canonical integer."""
+    if isinstance(value, str):
+        value = value.strip().removeprefix("track_")
+    return int(value)
+
+
+@dataclass(frozen=True, slots=True)
 class Track:
     """Class for bundling information of a Creative Commons track."""
 
-    id: str
+    id: TrackId
     audio_url: str
     attribution: str
     license_text: str
 
 
+CATALOG_COLUMNS = ("TRACK_ID", "TITLE", "ATTRIBUTION_SUFFIX", "LICENSE", "WEIGHT")
+CATALOG_VERSION = "3"
+
+
+class TrackCatalog:
+    """Process-wide index over the track catalog.
+
+    The catalog is a columnar Arrow table in catalog order, either memory-mapped from
+    the file written by scripts/build_catalog.py (so that several workers share the
+    same pages) or built from the TSVs. Only the ids are copied into a map from track
+    id to row position; `Track` objects are created on lookup. The license texts and
+    the " by <artist> " attribution suffixes repeat a lot, so they are dictionary
+    encoded and every Track shares one string object per distinct value. Sampling
+    weights are fed into a `WeightedSampler`, so lookups are O(1) and removing a track
+    from the pool or drawing one costs O(log n).
+
+    Track ids are canonical integers (see `to_track_id`) everywhere in the catalog.
+    """
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        self.ids: list[TrackId] = table["TRACK_ID"].to_pylist()
+        self.positions: dict[TrackId, int] = {
+            track_id: position for position, track_id in enumerate(self.ids)
+        }
+        self.weights: np.ndarray = table["WEIGHT"].to_numpy()
+        self._titles = table["TITLE"]
+        self._suffix_codes, self._suffixes = _dictionary_codes(
+            table["ATTRIBUTION_SUFFIX"]
+        )
+        self._license_codes, self._licenses = _dictionary_codes(table["LICENSE"])
+        self._samplers = {
+            True: WeightedSampler(self.weights),
+            False: WeightedSampler(np.ones(len(self.ids))),
+        }
+        self._saturated: AbstractSet[TrackId] = frozenset()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframes(
+        cls, tracks: pd.DataFrame, play_counts: Optional[pd.Series] = None
+    ) -> "TrackCatalog":
+        return cls(build_catalog_table(tracks, play_counts))
+
+    @classmethod
+    def from_file(cls, catalog_file) -> "TrackCatalog":
+        """Memory-map a catalog written by scripts/build_catalog.py."""
+        with pa.memory_map(str(catalog_file)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return cls(table)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, track_id: TrackId) -> bool:
+        return track_id in self.positions
+
+    def get(self, track_id: TrackId) -> Track:
+        return self._track_at(self.positions[track_id])
+
+    def _track_at(self, position: int) -> Track:
+        track_id = self.ids[position]
+        suffix = self._suffixes[self._suffix_codes[position]]
+        return Track(
+            track_id,
+            audio_url(track_id),
+            self._titles[position].as_py() + suffix,
+            self._licenses[self._license_codes[position]],
+        )
+
+    def to_positions(self, track_ids: Iterable[TrackId]) -> list[int]:
+        """Map track ids to catalog positions, skipping ids not in the catalog."""
+        positions = self.positions
+        return [positions[track_id] for track_id in track_ids if track_id in positions]
+
+    def _set_saturated(self, track_ids: AbstractSet[TrackId]) -> None:
+        """Remove the given tracks from the sampling pool and put back those that
+        were removed before but are not in `track_ids` anymore. The caller must hold
+        the lock.
+
+        Only the difference to the previous set is applied, and passing the very same
+        set object again is free.
+        """
+        if track_ids is self._saturated:
+            return
+        added = self.to_positions(track_ids - self._saturated)
+        removed = self.to_positions(self._saturated - track_ids)
+        for sampler in self._samplers.values():
+            sampler.disable(added)
+            sampler.enable(removed)
+        self._saturated = track_ids
+
+    def sample(
+        self,
+        exclude: Iterable[TrackId] = (),
+        weighted: bool = True,
+        saturated: Optional[AbstractSet[TrackId]] = None,
+    ) -> Optional[Track]:
+        """Draw a random track that is neither saturated nor in `exclude`.
+
+        :param exclude: track ids that must not be returned
+        :param weighted: if True, draw proportionally to the play counts
+        :param saturated: track ids to keep out of the pool for this and later draws
+            until a draw passes a set without them, e.g. the tracks at the annotation
+            limit; applied together with the draw, so another thread's older set
+            cannot slip in between
+        :return: a Track or None if no eligible track is left
+        """
+        with self._lock:
+            if saturated is not None:
+                self._set_saturated(saturated)
+            position = self._samplers[weighted].sample(self.to_positions(exclude))
+        return None if position is None else self._track_at(position)
+
+    def sample_many(
+        self,
+        k: int,
+        exclude: Iterable[TrackId] = (),
+        weighted: bool = True,
+        saturated: Optional[AbstractSet[TrackId]] = None,
+    ) -> list[Track]:
+        """Draw up to k distinct tracks that are neither saturated nor in `exclude`."""
+        with self._lock:
+            if saturated is not None:
+                self._set_saturated(saturated)
+            positions = self._samplers[weighted].sample_many(
+                k, self.to_positions(exclude)
+            )
+        return [self._track_at(position) for position in positions]
+
+
 @st.experimental_memo
 def load_track_tsv(tsv_file=None) -> pd.DataFrame:
     if tsv_file is None:
         tsv_file = get_track_tsv_file()
-    return pd.read_csv(tsv_file, delimiter="\t", converters={"TRACK_ID": str})
+    return pd.read_csv(
+        tsv_file,
+        delimiter="\t",
+        converters={"TRACK_ID": to_track_id},
+        dtype={"LICENSE": "category"},
+    )
 
 
 @st.experimental_memo
 def load_jamendo_stats_tsv(tsv_file="data/jamendo_stats.tsv") -> pd.DataFrame:
-    df = pd.read_csv(tsv_file, delimiter="\t", converters={"track": str})
+    df = pd.read_csv(tsv_file, delimiter="\t", converters={"track": to_track_id})
     return df.set_index("track")
 
 
+def _dictionary_codes(column: pa.ChunkedArray) -> tuple[np.ndarray, list[str]]:
+    """Split a dictionary encoded column into its codes and its string table."""
+    array = column.combine_chunks()
+    return array.indices.to_numpy(), array.dictionary.to_pylist()
+
+
+def split_attribution(attribution: str) -> tuple[str, str]:
+    """Split "<title> by <artist> " into the title and the " by <artist> " suffix."""
+    by = attribution.rfind(" by ")
+    if by == -1:
+        return attribution, ""
+    return attribution[:by], attribution[by:]
+
+
+def build_catalog_table(
+    tracks: pd.DataFrame, play_counts: Optional[pd.Series] = None
+) -> pa.Table:
+    """Combine the track TSV and the play counts into one columnar catalog table."""
+    track_ids = np.fromiter(
+        map(to_track_id, tracks["TRACK_ID"]), dtype=np.int64, count=len(tracks)
+    )
+    if play_counts is None:
+        weights = np.ones(len(track_ids), dtype=np.float64)
+    else:
+        play_counts = play_counts.set_axis(play_counts.index.map(to_track_id))
+        # tracks without stats get zero weight, as pandas' weighted sample did
+        weights = play_counts.reindex(track_ids).fillna(0).to_numpy(dtype=np.float64)
+        if len(track_ids) and not weights.any():
+            logging.warning("No track has play counts, check the stats file's ids")
+    split = [split_attribution(attribution) for attribution in tracks["ATTRIBUTION"]]
+    titles = [title for title, _ in split]
+    suffixes = [suffix for _, suffix in split]
+    return pa.table(
+        [
+            pa.array(track_ids, pa.int64()),
+            pa.array(titles, pa.string()),
+            pa.array(suffixes, pa.string()).dictionary_encode(),
+            pa.array(list(tracks["LICENSE"]), pa.string()).dictionary_encode(),
+            pa.array(weights, pa.float64()),
+        ],
+        names=CATALOG_COLUMNS,
+    )
+
+
+def write_catalog_file(table: pa.Table, catalog_file, tsv_file: str) -> None:
+    """Write an uncompressed Arrow IPC file, which can be memory-mapped as is.
+
+    :param tsv_file: the track TSV the catalog was built from, checked when loading
+    """
+    table = table.replace_schema_metadata(
+        {"tsv_file": str(tsv_file), "version": CATALOG_VERSION}
+    )
+    with pa.OSFile(str(catalog_file), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+@timed("music.get_track_catalog")
+@st.experimental_singleton
+def get_track_catalog() -> TrackCatalog:
+    tsv_file = get_track_tsv_file()
+    catalog_file = Path(get_catalog_file())
+    if catalog_file.exists():
+        catalog = TrackCatalog.from_file(catalog_file)
+        metadata = catalog.table.schema.metadata or {}
+        if metadata.get(b"tsv_file", b"").decode() == str(tsv_file) and (
+            metadata.get(b"version", b"").decode() == CATALOG_VERSION
+        ):
+            logging.info(f"Memory-mapped track catalog from {catalog_file}")
+            return catalog
+        logging.warning(
+            f"{catalog_file} is outdated or was not built from {tsv_file}, "
+            "loading the TSVs instead"
+        )
+    play_counts = load_jamendo_stats_tsv()["rate_listened_total"]
+    return TrackCatalog.from_dataframes(load_track_tsv(tsv_file), play_counts)
+
+
+@timed("music.get_random_track")
 def get_random_track(exclude=None) -> Optional[Track]:
     if exclude is None:
         exclude = []
-    tracks = load_track_tsv()
-    tracks: pd.DataFrame = tracks[~tracks["TRACK_ID"].isin(exclude)]
-    if not tracks.empty:
-        track_id, attribution, license_text = tracks.sample().values[0]
-        return Track(str(track_id), audio_url(track_id), attribution, license_text)
-    else:
-        return None
+    return get_track_catalog().sample(exclude, weighted=False)
+
 
+@timed("music.get_random_track_with_weights")
+def get_random_track_with_weights(exclude=None, saturated=None) -> Optional[Track]:
+    """Draw a track proportionally to its play count.
 
-def get_random_track_with_weights(exclude=None) -> Optional[Track]:
+    :param exclude: track ids to skip for this draw only, e.g. the ones a user has seen
+    :param saturated: set of track ids to keep out of the pool until they are missing
+        from a later call, e.g. the tracks at the annotation limit
+    """
     if exclude is None:
         exclude = []
-    tracks = load_track_tsv()
-    tracks = tracks.set_index("TRACK_ID")
-    tracks: pd.DataFrame = tracks.drop(exclude)
-    play_counts = load_jamendo_stats_tsv()["rate_listened_total"]
-    if not tracks.empty:
-        results = tracks.sample(weights=play_counts)
-        attribution, license_text = results.values[0]
-        track_id = results.index[0]
-        return Track(str(track_id), audio_url(track_id), attribution, license_text)
-    else:
-        return None
+    if saturated is not None:
+        saturated = frozenset(saturated)
+    return get_track_catalog().sample(exclude, saturated=saturated)
+
+
+@timed("music.get_random_tracks_with_weights")
+def get_random_tracks_with_weights(k: int, exclude=None, saturated=None) -> list[Track]:
+    """Draw up to k distinct tracks, see get_random_track_with_weights."""
+    if exclude is None:
+        exclude = []
+    if saturated is not None:
+        saturated = frozenset(saturated)
+    return get_track_catalog().sample_many(k, exclude, saturated=saturated)
 
 
-def get_track_info(track_id) -> Track:
-    tracks = load_track_tsv()
-    entry = tracks[tracks["TRACK_ID"] == track_id]
-    track_id, attribution, license_text = entry.values[0]
-    return Track(track_id, audio_url(track_id), attribution, license_text)
+@timed("music.get_track_info")
+def get_track_info(track_id: TrackId) -> Track:
+    return get_track_catalog().get(track_id)
 
 
 def audio_url(audio_id):
+    if clip_url := get_clip_url():
+        return f"{clip_url.rstrip('/')}/{audio_id}.mp3"
     return f"https://mp3d.jamendo.com/?trackid={audio_id}&format=mp32#t=0,120"
 
 
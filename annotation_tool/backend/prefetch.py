@@ -0,0 +1,75 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from annotation_tool.backend.music import Track, TrackId
+from annotation_tool.backend.utils import locked_singleton
+
+
+@locked_singleton
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+
+class TrackPrefetchQueue:
+    """Per-session queue of candidate tracks for the next annotation.
+
+    The queue is refilled in a background thread, so the page after a submit or skip
+    can be drawn without waiting for the track assignment. Candidates may go stale
+    while they wait (another user may push a track to the annotation limit), so they
+    are re-validated when popped.
+    """
+
+    def __init__(self, size: int = 3):
+        self.size = size
+        self._tracks: deque[Track] = deque()
+        self._lock = threading.Lock()
+        self._refill: Optional[Future] = None
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def refill(self, fetch: Callable[[int, set[TrackId]], list[Track]]) -> None:
+        """Top the queue up to its size in the background.
+
+        :param fetch: called with the number of missing tracks and the ids already
+            queued, returns new candidate tracks
+        """
+        with self._lock:
+            if self._refill is not None and not self._refill.done():
+                return
+            missing = self.size - len(self._tracks)
+            if missing <= 0:
+                return
+            queued = {track.id for track in self._tracks}
+            self._refill = get_prefetch_executor().submit(
+                self._fetch_and_extend, fetch, missing, queued
+            )
+
+    def _fetch_and_extend(self, fetch, missing: int, queued: set[TrackId]) -> None:
+        try:
+            tracks = fetch(missing, queued)
+        except Exception:
+            logging.exception("Prefetching tracks failed")
+            return
+        with self._lock:
+            self._tracks.extend(tracks)
+
+    def pop(self, is_valid: Callable[[Track], bool]) -> Optional[Track]:
+        """Return the first queued track that is still valid, dropping stale ones.
+
+        Does not wait for a running refill; returns None if no valid track is queued.
+        """
+        with self._lock:
+            while self._tracks:
+                track = self._tracks.popleft()
+                if is_valid(track):
+                    return track
+                logging.debug(f"Dropping stale prefetched track {track.id}")
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tracks.clear()
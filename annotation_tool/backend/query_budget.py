@@ -0,0 +1,143 @@
+"""Count the SQL statements issued during one script run and flag wasteful pages.
+
+A tracker is bound to the current context (the script run's thread) with
+`track_queries`; every statement executed on any engine in that context is recorded.
+On exit it warns about statements that ran more than once with identical parameters,
+and warns, or raises `QueryBudgetExceeded` in strict mode, if more statements ran than
+the budget allows. Statements run in other threads, e.g. by the prefetcher or on the
+async engine's event loop, are not counted.
+
+`page_query_budget` tracks a whole script run of the app. Widget callbacks run before
+the script, so the ones decorated with `tracked_callback` keep their statements in the
+session state until the script run picks them up and counts them too.
+"""
+import functools
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional, TypeVar
+
+import streamlit as st
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from annotation_tool.backend.config import (
+    get_query_budget,
+    is_query_budget_enabled,
+    is_query_budget_strict,
+)
+from annotation_tool.backend.metrics import statement_label
+
+F = TypeVar("F", bound=Callable)
+
+CALLBACK_STATEMENTS_KEY = "query_budget_callback_statements"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryTracker:
+    def __init__(self, name: str, budget: Optional[int] = None):
+        self.name = name
+        self.budget = budget
+        self.statements: list[tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str, parameters) -> None:
+        self.statements.append((statement_label(statement), repr(parameters)))
+
+    def duplicates(self) -> dict[str, int]:
+        """Statements run more than once with the same parameters, and how often."""
+        counts = Counter(self.statements)
+        return {statement: n for (statement, _), n in counts.items() if n > 1}
+
+    def check(self, strict: bool = False) -> None:
+        for statement, n in self.duplicates().items():
+            logging.warning(f"{self.name} ran this statement {n} times: {statement}")
+        if self.budget is not None and len(self) > self.budget:
+            message = f"{self.name} ran {len(self)} statements, budget is {self.budget}"
+            if strict:
+                raise QueryBudgetExceeded(message)
+            logging.warning(message)
+
+
+_current_tracker: ContextVar[Optional[QueryTracker]] = ContextVar(
+    "current_query_tracker", default=None
+)
+
+
+def _record_statement(conn, cursor, statement, parameters, context, many):
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.record(statement, parameters)
+
+
+@contextmanager
+def _bind(tracker: QueryTracker) -> Iterator[QueryTracker]:
+    if not event.contains(Engine, "before_cursor_execute", _record_statement):
+        event.listen(Engine, "before_cursor_execute", _record_statement)
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+@contextmanager
+def track_queries(
+    name: str, budget: Optional[int] = None, strict: bool = False
+) -> Iterator[QueryTracker]:
+    """Record the statements run in this context and check them on a clean exit.
+
+    :param name: what is tracked, e.g. the page, used in the messages
+    :param budget: maximum number of statements, None for no limit
+    :param strict: raise QueryBudgetExceeded instead of warning, e.g. in tests
+    """
+    with _bind(QueryTracker(name, budget)) as tracker:
+        yield tracker
+    tracker.check(strict)
+
+
+@contextmanager
+def page_query_budget(get_page: Callable[[], str]) -> Iterator[Optional[QueryTracker]]:
+    """Track one script run, plus the tracked callbacks that ran before it, if there
+    is a [query_budget] section, and check it against the budget of the page that is
+    active at the end of the run.
+
+    :param get_page: returns the active page; only called on exit, so tracking can
+        start before the session state is initialized
+    """
+    if not is_query_budget_enabled():
+        yield None
+        return
+    tracker = QueryTracker("script run")
+    tracker.statements.extend(st.session_state.get(CALLBACK_STATEMENTS_KEY, []))
+    st.session_state[CALLBACK_STATEMENTS_KEY] = []
+    with _bind(tracker):
+        yield tracker
+    page = get_page()
+    tracker.name = f"{page} page"
+    tracker.budget = get_query_budget(page)
+    tracker.check(is_query_budget_strict())
+
+
+def tracked_callback(func: F) -> F:
+    """Count the statements of a widget callback towards the next script run."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_tracker.get() is not None or not is_query_budget_enabled():
+            return func(*args, **kwargs)  # called from a tracked script run
+        tracker = QueryTracker(func.__name__)
+        try:
+            with _bind(tracker):
+                return func(*args, **kwargs)
+        finally:
+            statements = st.session_state.get(CALLBACK_STATEMENTS_KEY, [])
+            st.session_state[CALLBACK_STATEMENTS_KEY] = statements + tracker.statements
+
+    return wrapper
@@ -0,0 +1,141 @@
+import random
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional, Sequence
+
+
+class FenwickTree:
+    """Binary indexed tree over non-negative weights.
+
+    Supports setting a single weight and drawing a position proportionally to the
+    weights in O(log n), so removing a track from the pool is just zeroing its weight.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        self._size = len(weights)
+        self._weights = [float(weight) for weight in weights]
+        self._tree = [0.0] + self._weights
+        for index in range(1, self._size + 1):
+            parent = index + (index & -index)
+            if parent <= self._size:
+                self._tree[parent] += self._tree[index]
+        self._top_bit = 1 << (self._size.bit_length() - 1) if self._size else 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, position: int) -> float:
+        return self._weights[position]
+
+    def __setitem__(self, position: int, weight: float) -> None:
+        delta = float(weight) - self._weights[position]
+        if not delta:
+            return
+        self._weights[position] = float(weight)
+        index = position + 1
+        while index <= self._size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, end: int) -> float:
+        """Sum of the weights at positions [0, end)."""
+        total = 0.0
+        while end > 0:
+            total += self._tree[end]
+            end -= end & -end
+        return total
+
+    @property
+    def total(self) -> float:
+        return self.prefix_sum(self._size)
+
+    def find(self, target: float) -> int:
+        """Return the first position whose cumulative weight exceeds target."""
+        position = 0
+        bit = self._top_bit
+        while bit:
+            index = position + bit
+            if index <= self._size and self._tree[index] <= target:
+                position = index
+                target -= self._tree[index]
+            bit >>= 1
+        return min(position, self._size - 1)
+
+
+class WeightedSampler:
+    """Thread-safe weighted sampler on top of a FenwickTree.
+
+    Positions can be disabled persistently (e.g. tracks at the annotation limit) or
+    excluded for a single draw (e.g. tracks a user has already seen). Both cost
+    O(log n) per position, a draw costs O(log n).
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        self._base_weights = [float(weight) for weight in weights]
+        self._tree = FenwickTree(self._base_weights)
+        self._disabled: set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    @property
+    def total(self) -> float:
+        return self._tree.total
+
+    def disable(self, positions: Iterable[int]) -> None:
+        with self._lock:
+            for position in positions:
+                self._disabled.add(position)
+                self._tree[position] = 0.0
+
+    def enable(self, positions: Iterable[int]) -> None:
+        with self._lock:
+            for position in positions:
+                self._disabled.discard(position)
+                self._tree[position] = self._base_weights[position]
+
+    def sample(
+        self, exclude: Iterable[int] = (), rng: Optional[random.Random] = None
+    ) -> Optional[int]:
+        """Draw one position, skipping disabled positions and those in `exclude`.
+
+        :return: the drawn position or None if no weight is left
+        """
+        rng = rng or random
+        with self._lock, self._excluded(exclude):
+            total = self._tree.total
+            if total <= 0:
+                return None
+            return self._tree.find(rng.random() * total)
+
+    def sample_many(
+        self, k: int, exclude: Iterable[int] = (), rng: Optional[random.Random] = None
+    ) -> list[int]:
+        """Draw up to k distinct positions without replacement."""
+        rng = rng or random
+        drawn: list[int] = []
+        with self._lock, self._excluded(exclude) as excluded:
+            for _ in range(k):
+                total = self._tree.total
+                if total <= 0:
+                    break
+                position = self._tree.find(rng.random() * total)
+                drawn.append(position)
+                excluded[position] = self._tree[position]
+                self._tree[position] = 0.0
+        return drawn
+
+    @contextmanager
+    def _excluded(self, positions: Iterable[int]):
+        """Temporarily zero the given positions; the caller must hold the lock."""
+        previous = {}
+        for position in positions:
+            if position not in previous and self._tree[position]:
+                previous[position] = self._tree[position]
+                self._tree[position] = 0.0
+        try:
+            yield previous
+        finally:
+            for position, weight in previous.items():
+                self._tree[position] = weight
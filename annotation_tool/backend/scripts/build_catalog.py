@@ -0,0 +1,25 @@
+import argparse
+
+from annotation_tool.backend.config import get_catalog_file, get_track_tsv_file
+from annotation_tool.backend.music import (
+    build_catalog_table,
+    load_jamendo_stats_tsv,
+    load_track_tsv,
+    write_catalog_file,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile the track TSV and the Jamendo play counts into a single "
+        "columnar catalog file that the app memory-maps at start-up."
+    )
+    parser.add_argument("--tsv-file", help="Defaults to the configured track TSV.")
+    parser.add_argument("--stats-file", default="data/jamendo_stats.tsv")
+    parser.add_argument("--output", help="Defaults to the configured catalog file.")
+    args = parser.parse_args()
+    tsv_file = args.tsv_file or get_track_tsv_file()
+    table = build_catalog_table(
+        load_track_tsv(tsv_file),
+        load_jamendo_stats_tsv(args.stats_file)["rate_listened_total"],
+    )
+    write_catalog_file(table, args.output or get_catalog_file(), tsv_file)
@@ -0,0 +1,4 @@
+from annotation_tool.backend.models import create_missing_indexes
+
+if __name__ == "__main__":
+    create_missing_indexes()
@@ -1,32 +1,181 @@
+"""Export the database tables to Parquet (or Arrow IPC) files.
+
+Rows are streamed from a server-side cursor and written in row-group sized chunks, so
+memory stays flat however large the tables get. Each run only exports rows added since
+the previous run: the highest id (or creation time, for users) per table is kept in
+export_state.json next to the files, and every run writes one new file per table.
+Users' nickname changes are only picked up by a --full export.
+"""
+import argparse
+import json
+import logging
+from datetime import datetime
 from pathlib import Path
-from typing import Type
+from typing import Optional, Type
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Column, select, types
 from sqlmodel import SQLModel
 
 from annotation_tool.backend.models import (
-    get_all,
+    get_engine,
     User,
     Annotation,
     SkippedTrack,
     Evaluation,
 )
 
+STATE_FILE = "export_state.json"
+CURSOR_COLUMNS = {User: "created", Annotation: "id", SkippedTrack: "id", Evaluation: "id"}
+ARROW_TYPES = {
+    types.Integer: pa.int64(),
+    types.String: pa.string(),
+    types.DateTime: pa.timestamp("us"),
+}
+
+
+def arrow_schema(data_model: Type[SQLModel]) -> pa.Schema:
+    return pa.schema(
+        (column.name, _arrow_type(column)) for column in data_model.__table__.columns
+    )
+
+
+def _arrow_type(column: Column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, types.TypeDecorator):  # e.g. sqlmodel's AutoString
+        column_type = column_type.impl
+    for sql_type, arrow_type in ARROW_TYPES.items():
+        if isinstance(column_type, sql_type):
+            return arrow_type
+    raise TypeError(f"No Arrow type for column {column.name} of type {column.type}")
+
+
+class ChunkWriter:
+    """Write record batches to a Parquet file (one row group per chunk) or an Arrow
+    IPC file, creating the file only once the first chunk arrives."""
+
+    def __init__(self, path: Path, schema: pa.Schema, file_format: str):
+        self.path = path
+        self.schema = schema
+        self.file_format = file_format
+        self.rows = 0
+        self._writer = None
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.file_format == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self.schema)
+            else:
+                self._writer = pa.ipc.new_file(str(self.path), self.schema)
+        if self.file_format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self.rows += batch.num_rows
 
-def fetch_tables(data_models: list[Type[SQLModel]], out_base_path: Path):
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def export_table(
+    data_model: Type[SQLModel],
+    out_base_path: Path,
+    since=None,
+    chunk_size: int = 10_000,
+    file_format: str = "parquet",
+    run_id: Optional[str] = None,
+):
+    """Stream the rows of one table with a cursor value above `since` into a new file.
+
+    :return: the highest cursor value written, or `since` if there were no new rows
+    """
+    table = data_model.__table__
+    cursor: Column = table.columns[CURSOR_COLUMNS[data_model]]
+    statement = select(table).order_by(cursor)
+    if since is not None:
+        statement = statement.where(cursor > since)
+    schema = arrow_schema(data_model)
+    run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    extension = "parquet" if file_format == "parquet" else "arrow"
+    path = out_base_path / table.name / f"{table.name}-{run_id}.{extension}"
+    writer = ChunkWriter(path, schema, file_format)
+    last_value = since
+    try:
+        with get_engine().connect() as connection:
+            result = connection.execution_options(yield_per=chunk_size).execute(
+                statement
+            )
+            for rows in result.partitions():
+                columns = list(zip(*rows))
+                writer.write(pa.RecordBatch.from_arrays(columns, schema=schema))
+                last_value = rows[-1][cursor.name]
+    finally:
+        writer.close()
+    logging.info(f"Exported {writer.rows} rows of {table.name}")
+    return last_value
+
+
+def export_tables(
+    data_models: list[Type[SQLModel]],
+    out_base_path: Path,
+    chunk_size: int = 10_000,
+    file_format: str = "parquet",
+    full: bool = False,
+):
+    state_path = out_base_path / STATE_FILE
+    state = {} if full or not state_path.exists() else json.loads(state_path.read_text())
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
     for data_model in data_models:
-        results = get_all(cls=data_model)
-        records = [i.dict() for i in results]
-        try:
-            df = pd.DataFrame.from_records(records, index="id")
-        except:
-            df = pd.DataFrame.from_records(records)
-        df.to_pickle(
-            out_base_path / f"{data_model.__tablename__}.pickle",
+        name = data_model.__tablename__
+        since = _decode_cursor(state.get(name))
+        last_value = export_table(
+            data_model, out_base_path, since, chunk_size, file_format, run_id
         )
+        if last_value is not None:
+            state[name] = _encode_cursor(last_value)
+        # save after every table, so a failed run does not export rows twice
+        state_path.write_text(json.dumps(state, indent=2))
+
+
+def _encode_cursor(value):
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    return value
+
+
+def _decode_cursor(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["datetime"])
+    return value
 
 
 if __name__ == "__main__":
-    output_path = Path("./data_dump")
-    output_path.mkdir(exist_ok=True)
-    fetch_tables([User, Annotation, SkippedTrack, Evaluation], output_path)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, default=Path("./data_dump"))
+    parser.add_argument(
+        "--format", choices=["parquet", "arrow"], default="parquet", dest="file_format"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10_000,
+        help="Rows fetched per round-trip and written per row group.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the previous export state and export all rows.",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    args.output.mkdir(exist_ok=True)
+    export_tables(
+        [User, Annotation, SkippedTrack, Evaluation],
+        args.output,
+        args.chunk_size,
+        args.file_format,
+        args.full,
+    )
@@ -0,0 +1,4 @@
+from annotation_tool.backend.models import migrate_evaluation_counts
+
+if __name__ == "__main__":
+    migrate_evaluation_counts()
@@ -0,0 +1,4 @@
+from annotation_tool.backend.models import migrate_track_ids
+
+if __name__ == "__main__":
+    migrate_track_ids()
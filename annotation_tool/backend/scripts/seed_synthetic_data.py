@@ -0,0 +1,296 @@
+"""Fill the configured database with synthetic users, annotations, evaluations and
+skipped tracks at a chosen scale, to check query plans and indexes on large tables.
+
+The data follows the shapes of the real thing: annotations and evaluations per user
+follow a power law, tracks are picked in proportion to their Jamendo play counts and
+no annotation gets more evaluations than the configured evaluation limit, nor one by
+its author or two by the same user. Rows are appended (ids continue after the current
+maximum) and bulk inserted in batches, with COPY on Postgres and executemany
+elsewhere. Run from the project root, e.g.:
+
+    python -m annotation_tool.backend.scripts.seed_synthetic_data --annotations 1000000
+"""
+import argparse
+import csv
+import io
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+from sqlalchemy import Table, func, select
+from sqlalchemy.engine import Connection, Engine
+
+from annotation_tool.backend.config import get_evaluation_limit
+from annotation_tool.backend.models import (
+    Annotation,
+    Evaluation,
+    SkippedTrack,
+    User,
+    create_tables,
+    get_engine,
+)
+from annotation_tool.backend.music import get_track_catalog
+
+CAPTIONS = (
+    "An upbeat pop song with bright synths, a driving drum beat and female vocals.",
+    "A slow acoustic ballad with fingerpicked guitar and a soft, breathy male voice.",
+    "Dark ambient drones layered with distant piano notes and field recordings.",
+    "Energetic rock track with distorted guitars, pounding drums and shouted chorus.",
+    "Laid-back instrumental hip hop beat with jazzy piano samples and vinyl crackle.",
+)
+
+
+def power_law_activity(
+    n: int, exponent: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Relative activity of n users, Pareto distributed: a few do most of the work."""
+    activity = rng.pareto(exponent, n) + 1
+    return activity / activity.sum()
+
+
+def random_timestamps(
+    n: int, start: datetime, days: int, rng: np.random.Generator
+) -> np.ndarray:
+    offsets = rng.integers(0, days * 24 * 3600, n).astype("timedelta64[s]")
+    return np.datetime64(start, "s") + offsets
+
+
+def choose_evaluators(
+    annotation_index: np.ndarray,
+    authors: np.ndarray,
+    activity: np.ndarray,
+    rng: np.random.Generator,
+    max_rounds: int = 20,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Draw an evaluator per evaluation slot, redrawing slots whose evaluator is the
+    annotation's author or has already evaluated the annotation.
+
+    :return: the annotation index and the evaluator of each kept evaluation
+    """
+    n_users = len(activity)
+    evaluators = rng.choice(n_users, len(annotation_index), p=activity)
+    for _ in range(max_rounds):
+        pair_keys = annotation_index.astype(np.int64) * n_users + evaluators
+        _, first = np.unique(pair_keys, return_index=True)
+        duplicate = np.ones(len(pair_keys), dtype=bool)
+        duplicate[first] = False
+        bad = duplicate | (evaluators == authors[annotation_index])
+        if not bad.any():
+            break
+        evaluators[bad] = rng.choice(n_users, int(bad.sum()), p=activity)
+    else:
+        # give up on the few slots that keep colliding, e.g. with very few users
+        annotation_index, evaluators = annotation_index[~bad], evaluators[~bad]
+    return annotation_index, evaluators
+
+
+class SyntheticData:
+    """Column arrays of the generated rows; ids are offsets of the current maxima."""
+
+    def __init__(
+        self,
+        n_users: int,
+        n_annotations: int,
+        n_evaluations: int,
+        n_skipped: int,
+        max_evaluations: int,
+        track_ids: np.ndarray,
+        track_weights: np.ndarray,
+        first_annotation_id: int = 1,
+        prefix: str = "synthetic",
+        days: int = 365,
+        exponent: float = 1.2,
+        seed: int = 0,
+    ):
+        rng = np.random.default_rng(seed)
+        self.start = datetime.utcnow() - timedelta(days=days)
+        self.user_ids = np.array([f"{prefix}-{i}" for i in range(n_users)], object)
+        annotator_activity = power_law_activity(n_users, exponent, rng)
+        evaluator_activity = power_law_activity(n_users, exponent, rng)
+        # tracks without play counts still get picked now and then, like a track with
+        # a tenth of the smallest play count
+        positive = track_weights[track_weights > 0]
+        floor = positive.min() / 10 if len(positive) else 1
+        track_p = track_weights + floor
+        track_p = track_p / track_p.sum()
+
+        self.annotation_ids = np.arange(n_annotations) + first_annotation_id
+        self.annotation_users = rng.choice(n_users, n_annotations, p=annotator_activity)
+        self.annotation_tracks = track_ids[
+            rng.choice(len(track_ids), n_annotations, p=track_p)
+        ]
+        self.annotation_times = random_timestamps(n_annotations, self.start, days, rng)
+        self.familiarity = rng.integers(0, 3, n_annotations)
+        self.captions = rng.integers(0, len(CAPTIONS), n_annotations)
+
+        # spread the evaluations over the annotations, at most max_evaluations each
+        n_evaluations = min(n_evaluations, n_annotations * max_evaluations)
+        slots = np.repeat(np.arange(n_annotations), max_evaluations)
+        slots = rng.choice(slots, n_evaluations, replace=False)
+        evaluated, evaluators = choose_evaluators(
+            np.sort(slots), self.annotation_users, evaluator_activity, rng
+        )
+        self.evaluation_annotations = evaluated
+        self.evaluation_users = evaluators
+        self.evaluation_counts = np.bincount(evaluated, minlength=n_annotations)
+        delay = rng.integers(60, 30 * 24 * 3600, len(evaluated))
+        self.evaluation_times = np.minimum(
+            self.annotation_times[evaluated] + delay.astype("timedelta64[s]"),
+            np.datetime64(datetime.utcnow(), "s"),
+        )
+        self.ratings = rng.integers(0, 6, len(evaluated))
+
+        self.skipped_users = rng.choice(n_users, n_skipped, p=annotator_activity)
+        self.skipped_tracks = track_ids[
+            rng.choice(len(track_ids), n_skipped, p=track_p)
+        ]
+        self.skipped_times = random_timestamps(n_skipped, self.start, days, rng)
+
+    def users(self, start: int, stop: int) -> Iterator[tuple]:
+        for i in range(start, min(stop, len(self.user_ids))):
+            yield self.user_ids[i], self.start, self.user_ids[i]
+
+    def annotations(self, start: int, stop: int) -> Iterator[tuple]:
+        for i in range(start, min(stop, len(self.annotation_ids))):
+            yield (
+                int(self.annotation_ids[i]),
+                CAPTIONS[self.captions[i]],
+                int(self.familiarity[i]),
+                self.annotation_times[i].item(),
+                int(self.annotation_tracks[i]),
+                self.user_ids[self.annotation_users[i]],
+                "",
+                int(self.evaluation_counts[i]),
+            )
+
+    def evaluations(self, start: int, stop: int) -> Iterator[tuple]:
+        for i in range(start, min(stop, len(self.evaluation_users))):
+            yield (
+                int(self.ratings[i]),
+                self.evaluation_times[i].item(),
+                int(self.annotation_ids[self.evaluation_annotations[i]]),
+                self.user_ids[self.evaluation_users[i]],
+            )
+
+    def skipped(self, start: int, stop: int) -> Iterator[tuple]:
+        for i in range(start, min(stop, len(self.skipped_users))):
+            yield (
+                int(self.skipped_tracks[i]),
+                self.user_ids[self.skipped_users[i]],
+                "",
+                self.skipped_times[i].item(),
+            )
+
+
+TABLE_COLUMNS = {
+    User: ("id", "created", "nickname"),
+    Annotation: (
+        "id",
+        "text",
+        "familiarity",
+        "timestamp",
+        "track_id",
+        "user_id",
+        "comments",
+        "evaluation_count",
+    ),
+    Evaluation: ("rating", "timestamp", "annotation_id", "user_id"),
+    SkippedTrack: ("track_id", "user_id", "comments", "timestamp"),
+}
+
+
+def insert_rows(
+    connection: Connection, table: Table, columns: tuple[str, ...], rows: list[tuple]
+) -> None:
+    """Bulk insert rows, with COPY if the connection is psycopg2's."""
+    if connection.dialect.driver == "psycopg2":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH CSV", buffer
+            )
+    else:
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def seed_synthetic_data(
+    data: SyntheticData, batch_size: int = 50_000, engine: Optional[Engine] = None
+) -> None:
+    """Insert the generated rows, into the configured database unless engine is given."""
+    engine = engine or get_engine()
+    for model, n_rows, make_rows in (
+        (User, len(data.user_ids), data.users),
+        (Annotation, len(data.annotation_ids), data.annotations),
+        (Evaluation, len(data.evaluation_users), data.evaluations),
+        (SkippedTrack, len(data.skipped_users), data.skipped),
+    ):
+        table, columns = model.__table__, TABLE_COLUMNS[model]
+        started = time.perf_counter()
+        for offset in range(0, n_rows, batch_size):
+            with engine.begin() as connection:
+                rows = list(make_rows(offset, offset + batch_size))
+                insert_rows(connection, table, columns, rows)
+            logging.info(f"{table.name}: {min(offset + batch_size, n_rows)}/{n_rows}")
+        seconds = time.perf_counter() - started
+        logging.info(f"Inserted {n_rows} rows into {table.name} in {seconds:.1f} s")
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            # explicit annotation ids leave the sequence behind
+            connection.exec_driver_sql(
+                "SELECT setval(pg_get_serial_sequence('annotations', 'id'), "
+                "(SELECT max(id) FROM annotations))"
+            )
+
+
+def max_annotation_id(engine: Optional[Engine] = None) -> Optional[int]:
+    with (engine or get_engine()).connect() as connection:
+        return connection.execute(select(func.max(Annotation.id))).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--annotations", type=int, default=100_000)
+    parser.add_argument(
+        "--evaluations",
+        type=int,
+        help="Defaults to twice the annotations, capped by the evaluation limit.",
+    )
+    parser.add_argument(
+        "--skipped", type=int, help="Defaults to a fifth of the annotations."
+    )
+    parser.add_argument(
+        "--prefix",
+        default="synthetic",
+        help="Prefix of the user ids and nicknames, change it to seed again.",
+    )
+    parser.add_argument("--exponent", type=float, default=1.2, help="Pareto exponent.")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    create_tables()
+    catalog = get_track_catalog()
+    data = SyntheticData(
+        n_users=args.users,
+        n_annotations=args.annotations,
+        n_evaluations=(
+            args.evaluations if args.evaluations is not None else 2 * args.annotations
+        ),
+        n_skipped=args.skipped if args.skipped is not None else args.annotations // 5,
+        max_evaluations=get_evaluation_limit(),
+        track_ids=np.asarray(catalog.ids),
+        track_weights=catalog.weights,
+        first_annotation_id=(max_annotation_id() or 0) + 1,
+        prefix=args.prefix,
+        days=args.days,
+        exponent=args.exponent,
+        seed=args.seed,
+    )
+    seed_synthetic_data(data, args.batch_size)
@@ -0,0 +1,125 @@
+"""Transcode the clip of every catalog track ahead of time, in parallel.
+
+Fills the clip cache of clips.py, so that the clip server only ever serves ready-made
+files. Progress is appended to a JSON-lines manifest in the cache directory; a rerun
+skips the tracks recorded as done or failed, so an interrupted run can simply be
+started again. Tracks missing from the source directory are looked for again.
+"""
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable
+
+from annotation_tool.backend.clips import ClipStore, get_clip_store, transcode_clip
+from annotation_tool.backend.config import get_track_tsv_file
+from annotation_tool.backend.music import TrackId, load_track_tsv
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+class ClipManifest:
+    """Append-only record of the outcome per track: "done", "missing" or "failed".
+
+    Later lines win, so a track that failed once and succeeded on a rerun is done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.status: dict[TrackId, str] = {}
+        if path.exists():
+            with path.open() as lines:
+                for line in lines:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.status[entry["track_id"]] = entry["status"]
+
+    def record(self, track_id: TrackId, status: str, **details) -> None:
+        self.status[track_id] = status
+        with self.path.open("a") as manifest:
+            entry = {"track_id": track_id, "status": status, **details}
+            manifest.write(json.dumps(entry) + "\n")
+
+
+def transcode_clips(
+    store: ClipStore,
+    track_ids: Iterable[TrackId],
+    workers: int,
+    retry_failed: bool = False,
+) -> dict[str, int]:
+    """Transcode the clips of the given tracks that are not done yet.
+
+    :return: number of tracks per outcome in this run, including "skipped"
+    """
+    store.cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest = ClipManifest(store.cache_dir / MANIFEST_FILE)
+    outcomes = {"done": 0, "missing": 0, "failed": 0, "skipped": 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for track_id in track_ids:
+            status = manifest.status.get(track_id)
+            clip = store.clip_path(track_id)
+            if clip.exists():  # possibly made on demand by the clip server
+                if status != "done":
+                    manifest.record(track_id, "done", size=clip.stat().st_size)
+                outcomes["skipped"] += 1
+                continue
+            if status == "failed" and not retry_failed:
+                outcomes["skipped"] += 1
+                continue
+            source = store.source_path(track_id)
+            if source is None or not source.exists():
+                if status != "missing":
+                    manifest.record(track_id, "missing")
+                outcomes["missing"] += 1
+                continue
+            future = executor.submit(
+                transcode_clip,
+                source,
+                clip,
+                store.duration,
+                store.bitrate,
+                store.ffmpeg,
+            )
+            futures[future] = track_id
+        for n_finished, future in enumerate(as_completed(futures), start=1):
+            track_id = futures.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                # ffmpeg's own message is more useful than the command line
+                error = getattr(e, "stderr", None) or str(e)
+                if isinstance(error, bytes):
+                    error = error.decode(errors="replace").strip()
+                logging.warning(f"Transcoding track {track_id} failed: {error}")
+                manifest.record(track_id, "failed", error=error)
+                outcomes["failed"] += 1
+            else:
+                size = store.clip_path(track_id).stat().st_size
+                manifest.record(track_id, "done", size=size)
+                outcomes["done"] += 1
+            if n_finished % 100 == 0:
+                logging.info(f"{n_finished} of {len(futures) + n_finished} clips")
+    return outcomes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tsv-file", help="Defaults to the configured track TSV.")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Parallel ffmpeg processes."
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Transcode again the tracks that failed in a previous run.",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    tracks = load_track_tsv(args.tsv_file or get_track_tsv_file())
+    outcomes = transcode_clips(
+        get_clip_store(), tracks["TRACK_ID"], args.workers, args.retry_failed
+    )
+    logging.info(", ".join(f"{count} {outcome}" for outcome, count in outcomes.items()))
@@ -0,0 +1,69 @@
+"""Warm up the process-wide caches before the first visitor needs them.
+
+Streamlit only runs app.py once a session connects, so the warm-up is started in a
+background thread by the first script run: the welcome page draws right away while
+the engine, the connection pool, the track catalog and the country list load behind
+it. Everything warmed here is a singleton, so later calls return the loaded objects.
+"""
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sqlalchemy.engine import Engine
+
+from annotation_tool.backend.models import get_engine, get_track_annotation_counter
+from annotation_tool.backend.music import get_track_catalog
+from annotation_tool.backend.utils import get_country_options_dict, locked_singleton
+
+
+def warm_connection_pool(engine: Engine) -> int:
+    """Open as many connections as the pool keeps and hand them back to it.
+
+    :return: the number of connections opened
+    """
+    size = getattr(engine.pool, "size", None)
+    n_connections = size() if callable(size) else 1
+    connections = [engine.connect() for _ in range(n_connections)]
+    for connection in connections:
+        connection.close()
+    return n_connections
+
+
+def warm_up() -> dict[str, float]:
+    """Load everything the first requests would otherwise load.
+
+    :return: seconds spent per step, in the order they ran
+    """
+    steps: dict[str, Callable[[], object]] = {
+        "engine": get_engine,
+        "connection pool": lambda: warm_connection_pool(get_engine()),
+        "track catalog": get_track_catalog,
+        "track annotation counts": get_track_annotation_counter,
+        "countries": get_country_options_dict,
+    }
+    timings = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    logging.info(
+        "Warm-up done: "
+        + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+    )
+    return timings
+
+
+@locked_singleton
+def start_warm_up() -> Future:
+    """Run warm_up once per process in a background thread."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm-up")
+    future = executor.submit(warm_up)
+    future.add_done_callback(_log_failure)
+    executor.shutdown(wait=False)
+    return future
+
+
+def _log_failure(future: Future) -> None:
+    if future.exception() is not None:
+        logging.error("Warm-up failed", exc_info=future.exception())
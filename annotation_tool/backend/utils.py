@@ -1,9 +1,30 @@
 """Code adapted from https://github.com/MTG/mtg-jamendo-dataset/blob/master/scripts/commons.py"""
 
 import csv
+import functools
+import threading
+from typing import Callable, TypeVar
 
 import streamlit
 
+F = TypeVar("F", bound=Callable)
+
+
+def locked_singleton(func: F) -> F:
+    """Like streamlit.experimental_singleton, but safe to call for the first time from
+    several threads at once: Streamlit 1.14 does not lock around creating the object,
+    so concurrent first calls could each get their own, e.g. their own LeaseMap."""
+    singleton = streamlit.experimental_singleton(func)
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return singleton(*args, **kwargs)
+
+    wrapper.clear = singleton.clear
+    return wrapper
+
 
 @streamlit.experimental_singleton
 def get_country_options_dict():
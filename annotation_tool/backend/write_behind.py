@@ -0,0 +1,157 @@
+"""Group commit of inserts that do not need to be written before the script run
+continues, e.g. annotations: fewer transactions and fsyncs under many concurrent users.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class WriteBehindQueue(Generic[T]):
+    """Collect inserts from all sessions and write them in small group commits.
+
+    A background thread takes everything submitted within `max_delay` seconds of the
+    first pending item, up to `max_batch` items, and hands it to `write` as one batch
+    (one transaction). If a batch fails, its items are retried one by one so that a
+    bad row only fails itself; `on_error` is called for each item that cannot be
+    written.
+
+    Items are submitted under a key, e.g. the user id: `wait(key)` blocks until that
+    key's items submitted so far are written, so a user reading from the database
+    after `wait` sees their own writes. `close` writes what is still pending and
+    should run on shutdown.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[T]], None],
+        on_error: Optional[Callable[[T, Exception], None]] = None,
+        max_delay: float = 0.005,
+        max_batch: int = 100,
+    ):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._write = write
+        self._on_error = on_error
+        self._pending: list[tuple[T, Hashable, Future]] = []
+        self._unwritten: dict[Hashable, set[Future]] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def __len__(self) -> int:
+        """Number of items submitted but not written yet."""
+        with self._condition:
+            return sum(len(futures) for futures in self._unwritten.values())
+
+    def submit(self, item: T, key: Hashable = None) -> Future:
+        """Queue an item for writing.
+
+        :return: a future that is done once the item is committed, or failed
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The write-behind queue is closed")
+            self._pending.append((item, key, future))
+            self._unwritten.setdefault(key, set()).add(future)
+            self._condition.notify()
+        return future
+
+    def wait(self, key: Hashable = None, timeout: Optional[float] = None) -> None:
+        """Block until the items submitted so far under key (or under any key, if key
+        is None) are written or have failed."""
+        with self._condition:
+            if key is None:
+                futures = set().union(*self._unwritten.values())
+            else:
+                futures = set(self._unwritten.get(key, ()))
+        if futures:
+            wait(futures, timeout)
+
+    def when_written(self, key: Hashable, callback: Callable[[], None]) -> None:
+        """Call callback once the items submitted so far under key are written or
+        have failed: right away if there are none, else on the writer thread."""
+        with self._condition:
+            futures = set(self._unwritten.get(key, ()))
+        if not futures:
+            callback()
+            return
+        remaining = len(futures)
+        lock = threading.Lock()
+
+        def on_done(_: Future) -> None:
+            nonlocal remaining
+            with lock:
+                remaining -= 1
+                if remaining:
+                    return
+            callback()
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """Stop accepting items and write everything still pending."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        # in case the writer thread is stuck or gone, write the rest from here
+        while batch := self._take_batch():
+            self._write_batch(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            self._write_batch(self._take_batch())
+
+    def _take_batch(self) -> list[tuple[T, Hashable, Future]]:
+        with self._condition:
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            return batch
+
+    def _write_batch(self, batch: list[tuple[T, Hashable, Future]]) -> None:
+        try:
+            self._write([item for item, _, _ in batch])
+            outcomes = [None] * len(batch)
+        except Exception:
+            logging.exception(f"Writing a batch of {len(batch)} failed, retrying each")
+            outcomes = [self._write_single(item) for item, _, _ in batch]
+        with self._condition:
+            for (_, key, future), _ in zip(batch, outcomes):
+                self._unwritten[key].discard(future)
+                if not self._unwritten[key]:
+                    del self._unwritten[key]
+        for (item, _, future), error in zip(batch, outcomes):
+            if error is None:
+                future.set_result(item)
+            else:
+                future.set_exception(error)
+
+    def _write_single(self, item: T) -> Optional[Exception]:
+        try:
+            self._write([item])
+            return None
+        except Exception as e:
+            logging.error(f"Could not write {item}: {e}")
+            if self._on_error is not None:
+                self._on_error(item, e)
+            return e
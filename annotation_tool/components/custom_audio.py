@@ -1,7 +1,13 @@
 import streamlit as st
 
+from annotation_tool.backend.config import get_clip_url
+
 
 def get_trimmed_audio_element(audio_url: str, max_duration: int = 120):
+    clip_url = get_clip_url()
+    if clip_url and audio_url.startswith(clip_url):
+        # already trimmed by the clip server, let the browser stream it
+        return get_audio_element(audio_url)
     html = """
     <audio controls style="width: 100%;">audio not supported</audio>
     <script src="https://cdn.jsdelivr.net/npm/audiobuffer-to-wav@1.0.0/index.js"></script>
@@ -46,3 +52,12 @@ def get_trimmed_audio_element(audio_url: str, max_duration: int = 120):
     </script>
     """.format(audio_url=audio_url, max_duration=max_duration)
     return st.components.v1.html(html, height=75)
+
+
+def get_audio_element(audio_url: str):
+    html = """
+    <audio controls preload="auto" style="width: 100%;" src="{audio_url}">
+      audio not supported
+    </audio>
+    """.format(audio_url=audio_url)
+    return st.components.v1.html(html, height=75)
@@ -1,5 +1,6 @@
 import logging
 import string
+from typing import Optional
 
 import streamlit as st
 
@@ -10,7 +11,13 @@ from annotation_tool.backend.models import (
     get_track_for_annotation,
     SkippedTrack,
     get_user_annotation_count,
+    get_tracks_for_annotation,
+    reserve_track_for_annotation,
+    release_track_reservation,
 )
+from annotation_tool.backend.music import Track
+from annotation_tool.backend.prefetch import TrackPrefetchQueue
+from annotation_tool.backend.query_budget import tracked_callback
 from annotation_tool.components.custom_audio import get_trimmed_audio_element
 from annotation_tool.pages.flow_control import USER_ID_KEY
 
@@ -19,6 +26,8 @@ CURRENT_TRACK = "current_track"
 FAMILIARITY_KEY = "familiarity_key"
 SKIP_CHECKBOX = "skip_checkbox"
 TRACK_ISSUE_KEY = "track_issue_key"
+PREFETCH_QUEUE = "prefetch_queue"
+PREFETCH_SIZE = 3
 
 FAMILIARITY_OPTIONS = {
     0: "Not familiar at all",
@@ -52,7 +61,9 @@ def show():
     user_id = st.session_state[USER_ID_KEY]
     if CURRENT_TRACK not in st.session_state:
         annotation_limit = get_annotation_limit()
-        track = get_track_for_annotation(user_id, annotation_limit)
+        track = _pop_prefetched_track(user_id, annotation_limit)
+        if track is None:
+            track = get_track_for_annotation(user_id, annotation_limit)
         st.session_state[CURRENT_TRACK] = track
     else:
         track = st.session_state[CURRENT_TRACK]
@@ -170,11 +181,35 @@ def _clear_current_track():
         del st.session_state[CURRENT_TRACK]
 
 
+def _get_prefetch_queue() -> TrackPrefetchQueue:
+    if PREFETCH_QUEUE not in st.session_state:
+        st.session_state[PREFETCH_QUEUE] = TrackPrefetchQueue(size=PREFETCH_SIZE)
+    return st.session_state[PREFETCH_QUEUE]
+
+
+def _prefetch_tracks(user_id: str):
+    annotation_limit = get_annotation_limit()
+    _get_prefetch_queue().refill(
+        lambda k, queued: get_tracks_for_annotation(
+            user_id, annotation_limit, k, exclude=queued
+        )
+    )
+
+
+def _pop_prefetched_track(user_id: str, annotation_limit: int) -> Optional[Track]:
+    return _get_prefetch_queue().pop(
+        lambda track: reserve_track_for_annotation(
+            user_id, track.id, annotation_limit
+        )
+    )
+
+
 def _is_caption_long_enough(text: str) -> bool:
     text = text.translate(str.maketrans("", "", string.punctuation))
     return len(text.split()) >= 8
 
 
+@tracked_callback
 def submit_annotation(track_id):
     caption: str = st.session_state[CAPTION_KEY]
     familiarity: int = st.session_state[FAMILIARITY_KEY]
@@ -191,9 +226,11 @@ def submit_annotation(track_id):
             comments=track_issue_comments,
         )
         add_to_db(annotation)
+        release_track_reservation(user_id, track_id)
         st.balloons()
         logging.info(f"Added {annotation}")
         _clear_current_track()
+        _prefetch_tracks(user_id)
 
     else:
         logging.debug("Setting session state")
@@ -201,6 +238,7 @@ def submit_annotation(track_id):
         st.session_state[FAMILIARITY_KEY] = familiarity
 
 
+@tracked_callback
 def skip_track(track_id):
     track_issue_comments: str = st.session_state[TRACK_ISSUE_KEY]
     user_id = st.session_state[USER_ID_KEY]
@@ -211,4 +249,6 @@ def skip_track(track_id):
         comments=track_issue_comments,
     )
     add_to_db(skipped_track)
+    release_track_reservation(user_id, track_id)
     _clear_current_track()
+    _prefetch_tracks(user_id)
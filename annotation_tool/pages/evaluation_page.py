@@ -2,17 +2,22 @@ import streamlit as st
 
 from annotation_tool.backend.config import get_evaluation_limit
 from annotation_tool.backend.models import (
-    get_annotated_track_for_evaluation,
+    reserve_evaluation_batch,
+    holds_evaluation_reservation,
+    release_evaluation_reservation,
     Evaluation,
     Annotation,
     add_to_db,
 )
+from annotation_tool.backend.query_budget import tracked_callback
 from annotation_tool.components.custom_audio import get_trimmed_audio_element
 from annotation_tool.pages.flow_control import USER_ID_KEY
 
 RATING_KEY = "rating"
 ACCEPTED_KEY = "accepted"
 CURRENT_EVALUATION_TRACK = "current_evaluation_track"
+EVALUATION_BATCH = "evaluation_batch"
+EVALUATION_BATCH_SIZE = 5
 
 
 def show():
@@ -36,11 +41,7 @@ def show():
     )
 
     if CURRENT_EVALUATION_TRACK not in st.session_state:
-        evaluation_limit = get_evaluation_limit()
-        track, annotation = get_annotated_track_for_evaluation(
-            st.session_state[USER_ID_KEY],
-            evaluation_limit,
-        )
+        track, annotation = _next_reserved_evaluation(st.session_state[USER_ID_KEY])
         st.session_state[CURRENT_EVALUATION_TRACK] = (track, annotation)
     else:
         track, annotation = st.session_state[CURRENT_EVALUATION_TRACK]
@@ -95,11 +96,27 @@ def show():
                     )
 
 
+def _next_reserved_evaluation(user_id: str):
+    """Serve the next annotation from the reserved batch, reserving a new batch when
+    it runs out. Annotations whose reservation has expired are dropped."""
+    for _ in range(2):
+        batch = st.session_state.get(EVALUATION_BATCH) or []
+        while batch:
+            track, annotation = batch.pop(0)
+            if holds_evaluation_reservation(user_id, annotation.id):
+                return track, annotation
+        st.session_state[EVALUATION_BATCH] = reserve_evaluation_batch(
+            user_id, EVALUATION_BATCH_SIZE, get_evaluation_limit()
+        )
+    return None, None
+
+
 def _clear_current_evaluation_track():
     if CURRENT_EVALUATION_TRACK in st.session_state:
         del st.session_state[CURRENT_EVALUATION_TRACK]
 
 
+@tracked_callback
 def submit_evaluation(annotation: Annotation, accepted: bool):
     user_id = st.session_state[USER_ID_KEY]
     if not accepted:
@@ -108,4 +125,5 @@ def submit_evaluation(annotation: Annotation, accepted: bool):
         rating = st.session_state[RATING_KEY]
     evaluation = Evaluation(rating=rating, annotation_id=annotation.id, user_id=user_id)
     add_to_db(evaluation)
+    release_evaluation_reservation(user_id, annotation.id)
     _clear_current_evaluation_track()
@@ -5,6 +5,7 @@ from uuid import uuid4
 import streamlit as st
 
 from annotation_tool.backend.models import User
+from annotation_tool.backend.query_budget import tracked_callback
 
 USER_ID_KEY = "user_id"
 ACTIVE_PAGE_KEY = "active_page"
@@ -14,13 +15,15 @@ RETURNING_USER_KEY = "returning_user"
 def init_session_state():
     if ACTIVE_PAGE_KEY not in st.session_state:
         st.session_state[ACTIVE_PAGE_KEY] = "Home"
-        if _check_query_parameter_user_id() is not None:
+        if (user_id := _check_query_parameter_user_id()) is not None:
+            st.session_state[USER_ID_KEY] = user_id
             st.session_state[RETURNING_USER_KEY] = True
             advance_page()
     if RETURNING_USER_KEY not in st.session_state:
         st.session_state[RETURNING_USER_KEY] = False
 
 
+@tracked_callback
 def advance_page(requested_page: Optional[str] = None):
     logging.debug(
         f"Current Page: {st.session_state[ACTIVE_PAGE_KEY]}, {requested_page=}"
@@ -57,7 +60,8 @@ def ensure_user_id():
         logging.debug("No user_id in session state, setting or generating...")
         user_id = _get_user_id()
         set_user_id(user_id)
-    elif _check_query_parameter_user_id() is None:
+    elif _get_query_parameter_user_id() != st.session_state[USER_ID_KEY]:
+        # the session's user id is already known, no need to look it up again
         set_user_id(st.session_state[USER_ID_KEY])
 
 
@@ -87,13 +91,18 @@ def _get_user_id() -> str:
 
 def _check_query_parameter_user_id() -> Optional[str]:
     from streamlit.runtime.scriptrunner import get_script_run_ctx
+    qp_user_id = _get_query_parameter_user_id()
+    if qp_user_id and user_id_exists(qp_user_id):
+        return qp_user_id
+    else:
+        return None
+
+
+def _get_query_parameter_user_id() -> Optional[str]:
     query_params = st.experimental_get_query_params()
     logging.info(f"{query_params=}")
     qp_user_id = query_params.get(USER_ID_KEY)
-    if qp_user_id and user_id_exists(qp_user_id[0]):
-        return qp_user_id[0]  # query parameters are a list: take the first item
-    else:
-        return None
+    return qp_user_id[0] if qp_user_id else None  # query parameters are lists
 
 
 def set_user_id(user_id: str):
@@ -4,10 +4,11 @@ import pandas as pd
 import streamlit as st
 
 from annotation_tool.backend.config import get_competition_date
-from annotation_tool.backend.models import get_leaderboard_counts
-
-ANNOTATION_SCORE_FACTOR = 5
-EVALUATION_SCORE_FACTOR = 1
+from annotation_tool.backend.models import (
+    ANNOTATION_SCORE_FACTOR,
+    EVALUATION_SCORE_FACTOR,
+    get_cached_leaderboard_counts,
+)
 
 competition_start_date = get_competition_date("competition_start_date") or date(2022, 11, 23)
 competition_end_date = get_competition_date("competition_end_date") or date(2023, 1, 31)
@@ -66,7 +67,7 @@ def show():
 
 
 def get_leaderboard_dataframe():
-    data = get_leaderboard_counts(competition_start_date, competition_end_date)
+    data = get_cached_leaderboard_counts(competition_start_date, competition_end_date)
     captions_written_column = "Annotations"
     captions_evaluated_column = "Evaluations"
     name_column = "Nickname"
@@ -0,0 +1,61 @@
+import pandas as pd
+import streamlit as st
+
+from annotation_tool.backend.config import get_metrics_admins
+from annotation_tool.backend.metrics import (
+    OPERATION_SECONDS,
+    REGISTRY,
+    SQL_SECONDS,
+    Histogram,
+)
+from annotation_tool.pages.flow_control import USER_ID_KEY
+
+
+def is_metrics_admin() -> bool:
+    return st.session_state.get(USER_ID_KEY) in get_metrics_admins()
+
+
+def show():
+    if not is_metrics_admin():
+        st.error("This page is only available to admins.")
+        return
+    st.header("📈 Metrics")
+    if not REGISTRY.enabled:
+        st.info("Metrics are disabled, set `enabled = true` in the [metrics] secrets.")
+        return
+    st.subheader("Backend calls")
+    st.dataframe(
+        _histogram_dataframe(REGISTRY.snapshot(OPERATION_SECONDS), "operation"),
+        use_container_width=True,
+    )
+    st.subheader("SQL statements")
+    st.dataframe(
+        _histogram_dataframe(REGISTRY.snapshot(SQL_SECONDS), "statement"),
+        use_container_width=True,
+    )
+    text = REGISTRY.to_prometheus()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download (Prometheus format)", text, "metrics.txt")
+    with col2:
+        st.button("Reset", on_click=REGISTRY.reset)
+
+
+def _histogram_dataframe(histograms: dict[str, Histogram], name: str) -> pd.DataFrame:
+    rows = [
+        {
+            name: label,
+            "calls": histogram.count,
+            "total s": histogram.sum,
+            "mean ms": histogram.sum / histogram.count * 1000,
+            "p50 ms": histogram.quantile(0.5) * 1000,
+            "p95 ms": histogram.quantile(0.95) * 1000,
+            "p99 ms": histogram.quantile(0.99) * 1000,
+        }
+        for label, histogram in histograms.items()
+        if histogram.count
+    ]
+    dataframe = pd.DataFrame(rows, columns=[name, "calls", "total s", "mean ms"])
+    if rows:
+        dataframe = pd.DataFrame(rows).sort_values("total s", ascending=False)
+    return dataframe.set_index(name)
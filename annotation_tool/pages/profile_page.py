@@ -1,14 +1,17 @@
 import logging
 import random
-from typing import Callable
+from typing import Callable, TYPE_CHECKING
 
 import sqlalchemy.exc
 import streamlit as st
-from wonderwords import RandomWord
 
 from annotation_tool.backend.models import User, add_to_db
+from annotation_tool.backend.query_budget import tracked_callback
 from annotation_tool.pages.flow_control import USER_ID_KEY
 
+if TYPE_CHECKING:
+    from wonderwords import RandomWord
+
 RANDOM_USERNAME = "UP_random_username"
 
 NICKNAME_INPUT = "nickname_input"
@@ -89,6 +92,7 @@ def _store_nickname(user_id: str) -> bool:
     return False
 
 
+@tracked_callback
 def advance_if_nickname_stored(user_id: str, callback: Callable[[], None]):
     logging.debug("In advance_if_nickname_stored")
     nickname_input = _get_nickname()
@@ -121,5 +125,8 @@ def _get_random_nickname(cache_to_session_state=False) -> str:
 
 
 @st.experimental_singleton
-def _get_random_word_generator() -> RandomWord:
+def _get_random_word_generator() -> "RandomWord":
+    # wonderwords loads its word lists on import, only pay for it on this page
+    from wonderwords import RandomWord
+
     return RandomWord()
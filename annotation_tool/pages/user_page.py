@@ -5,6 +5,7 @@ import streamlit as st
 
 from annotation_tool.backend.utils import get_country_options_dict
 from annotation_tool.backend.models import User, add_to_db
+from annotation_tool.backend.query_budget import tracked_callback
 from annotation_tool.pages.flow_control import USER_ID_KEY
 
 MUSIC_READING_INPUT = "music_reading_input"
@@ -128,6 +129,7 @@ def show(callback):
         )
 
 
+@tracked_callback
 def submit_user_form(
     done_callback: Callable[[], None],
     user: Optional[User],
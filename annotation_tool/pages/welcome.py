@@ -3,6 +3,7 @@ from functools import partial
 import streamlit as st
 
 from annotation_tool.backend.models import get_leaderboard_counts
+from annotation_tool.backend.query_budget import tracked_callback
 from annotation_tool.pages.faqs import FAQS_TEXT
 from annotation_tool.pages.flow_control import (
     user_id_exists,
@@ -111,6 +112,7 @@ def draw_main_page(callback):
         st.dataframe(get_leaderboard_dataframe())
 
 
+@tracked_callback
 def verify_user_id(callback):
     input_user_id = st.session_state[INPUT_USER_ID_KEY]
     if user_id_exists(input_user_id):
@@ -0,0 +1,114 @@
+"""In-process caches: LRU eviction, writes landing during a load and the track
+annotation counter."""
+from datetime import datetime
+
+from annotation_tool.backend.caches import (
+    LeaderboardSummary,
+    LRUCache,
+    TrackAnnotationCounter,
+)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.get_or_load("c", lambda: 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_get_or_load_loads_once():
+    cache = LRUCache(maxsize=2)
+    loads = []
+    for _ in range(3):
+        assert cache.get_or_load("a", lambda: loads.append(1) or 1) == 1
+    assert len(loads) == 1
+
+
+def test_update_of_missing_key_is_dropped():
+    cache = LRUCache(maxsize=2)
+    cache.update_if_present("a", lambda value: value + 1)
+    assert "a" not in cache
+
+
+def test_update_during_load_reloads():
+    """A write that lands while the value is read may or may not be part of it."""
+    cache = LRUCache(maxsize=2)
+    database = {"a": 1}
+
+    def load():
+        value = database["a"]
+        if len(loads) == 0:
+            database["a"] += 1
+            cache.update_if_present("a", lambda value: value + 1)
+        loads.append(value)
+        return value
+
+    loads = []
+    assert cache.get_or_load("a", load) == 2
+    assert loads == [1, 2]
+    assert cache.get("a") == 2
+
+
+def test_pop_during_load_reloads():
+    cache = LRUCache(maxsize=2)
+    loads = []
+
+    def load():
+        if not loads:
+            cache.pop("a")
+        loads.append(len(loads))
+        return loads[-1]
+
+    assert cache.get_or_load("a", load) == 1
+    assert loads == [0, 1]
+
+
+def test_counter_saturated():
+    counter = TrackAnnotationCounter({1: 2, 2: 1})
+    saturated = counter.saturated(2)
+    assert saturated == {1}
+    assert counter.saturated(2) is saturated  # unchanged sets are reused
+    counter.increment(2)
+    assert counter.saturated(2) == {1, 2}
+    assert counter[2] == 2
+
+
+def test_counter_ignores_increments_until_loaded():
+    counter = TrackAnnotationCounter()
+    counter.increment(1)
+    assert counter[1] == 0
+    counter.load_from(lambda: {1: 1})
+    assert counter[1] == 1
+
+
+def test_counter_reloads_on_increment_during_load():
+    counter = TrackAnnotationCounter()
+    database = {1: 1}
+    queries = []
+
+    def query():
+        counts = dict(database)
+        if not queries:
+            database[1] += 1  # committed after the read
+            counter.increment(1)
+        queries.append(counts)
+        return counts
+
+    counter.load_from(query)
+    assert len(queries) == 2
+    assert counter[1] == 2
+    counter.load_from(query)  # already loaded
+    assert len(queries) == 2
+
+
+def test_leaderboard_summary():
+    start, end = datetime(2022, 11, 23), datetime(2023, 1, 31)
+    summary = LeaderboardSummary([("a", "ann", 1, 0)], start, end, ttl=60)
+    summary.add("a", "ann", datetime(2022, 12, 1), annotations=1)
+    summary.add("b", None, datetime(2022, 12, 1), evaluations=1)
+    summary.add("b", None, datetime(2023, 2, 1), evaluations=1)  # out of range
+    summary.set_nickname("b", "bob")
+    assert sorted(summary.rows()) == [("ann", 2, 0), ("bob", 0, 1)]
@@ -0,0 +1,33 @@
+"""Range header parsing of the clip server."""
+import pytest
+
+from annotation_tool.backend.clip_server import parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=-", None),
+        ("items=0-10", None),
+        ("bytes=0-10,20-30", None),  # several ranges: serve the whole file
+        ("bytes=0-0", (0, 0)),
+        ("bytes=0-499", (0, 499)),
+        ("bytes=500-", (500, 999)),
+        ("bytes=900-2000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-2000", (0, 999)),
+        (" bytes=1-2 ", (1, 2)),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-4", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, SIZE)
@@ -0,0 +1,92 @@
+"""LeaseMap: reservations per holder, expiry and remembered releases."""
+import pytest
+
+from annotation_tool.backend.leases import LeaseMap
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def leases(clock):
+    return LeaseMap(ttl=10, clock=clock)
+
+
+def test_count_per_holder(leases):
+    leases.acquire(1, "a")
+    leases.acquire(1, "b")
+    leases.acquire(1, "a")  # extends, does not count twice
+    assert leases.count(1) == 2
+    assert leases.count(1, exclude_holder="a") == 1
+    assert leases.count(1, exclude_holder="c") == 2
+    assert leases.count(2) == 0
+    assert leases.holds(1, "a")
+    assert not leases.holds(2, "a")
+
+
+def test_release(leases):
+    leases.acquire(1, "a")
+    leases.acquire(1, "b")
+    leases.release(1, "a")
+    assert leases.count(1) == 1
+    leases.release(1, "b")
+    leases.release(1, "b")  # releasing twice is a no-op
+    assert leases.count(1) == 0
+    assert leases.keys() == []
+
+
+def test_leases_expire(leases, clock):
+    leases.acquire(1, "a")
+    clock.now = 5
+    leases.acquire(2, "a")
+    clock.now = 10
+    assert leases.count(1) == 0
+    assert leases.keys() == [2]
+    assert len(leases) == 1
+    clock.now = 12
+    leases.acquire(2, "a")  # extended
+    clock.now = 20
+    assert leases.holds(2, "a")
+
+
+def test_sweep_reclaims_expired_leases(leases, clock):
+    for key in range(5):
+        leases.acquire(key, "a")
+    clock.now = 11
+    leases.acquire(99, "a")  # a full sweep is due
+    assert list(leases._leases) == [99]
+
+
+def test_released_since(leases, clock):
+    leases.acquire(1, "a")
+    clock.now = 1
+    mark = leases.now()
+    assert not leases.released_since(1, mark)
+    clock.now = 2
+    leases.release(1, "a")
+    assert leases.released_since(1, mark)
+    assert not leases.released_since(1, leases.now() + 1)
+    assert not leases.released_since(2, mark)
+    leases.release(2, "a")  # nothing to release, nothing remembered
+    assert not leases.released_since(2, mark)
+
+
+def test_released_since_forgets_after_ttl(leases, clock):
+    leases.acquire(1, "a")
+    leases.release(1, "a")
+    clock.now = 11
+    leases.acquire(2, "a")  # the sweep drops the old release
+    assert 1 not in leases._released
+    # but a mark that old cannot be answered, so it counts as released
+    assert leases.released_since(1, 0)
+    assert not leases.released_since(1, leases.now())
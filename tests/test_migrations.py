@@ -0,0 +1,133 @@
+"""Migrations of databases created by earlier versions of the models, on SQLite."""
+import sqlite3
+
+import pytest
+import streamlit as st
+
+from annotation_tool.backend import models
+from annotation_tool.backend.models import (
+    migrate_evaluation_counts,
+    migrate_track_ids,
+)
+
+# the tables as the first release of the app created them
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id VARCHAR PRIMARY KEY, created DATETIME NOT NULL, nickname VARCHAR,
+    age_group INTEGER, country VARCHAR, english_level INTEGER, music_doing INTEGER,
+    music_writing INTEGER, music_reading INTEGER
+);
+CREATE TABLE annotations (
+    id INTEGER PRIMARY KEY, text VARCHAR NOT NULL, familiarity INTEGER NOT NULL,
+    timestamp DATETIME NOT NULL, track_id VARCHAR NOT NULL, user_id VARCHAR NOT NULL,
+    comments VARCHAR NOT NULL, FOREIGN KEY(user_id) REFERENCES users(id)
+);
+CREATE TABLE evaluations (
+    id INTEGER PRIMARY KEY, rating INTEGER NOT NULL, timestamp DATETIME NOT NULL,
+    annotation_id INTEGER NOT NULL, user_id VARCHAR NOT NULL,
+    FOREIGN KEY(annotation_id) REFERENCES annotations(id),
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+CREATE TABLE skippedtracks (
+    id INTEGER PRIMARY KEY, track_id VARCHAR NOT NULL, user_id VARCHAR NOT NULL,
+    comments VARCHAR NOT NULL, timestamp DATETIME NOT NULL,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+INSERT INTO users (id, created) VALUES
+    ('author', '2022-11-23 00:00:00'), ('evaluator', '2022-11-23 00:00:00');
+INSERT INTO annotations VALUES
+    (1, 'A calm piano piece.', 1, '2022-12-01 00:00:00', 'track_0000214', 'author', ''),
+    (2, 'Loud guitars.', 0, '2022-12-02 00:00:00', '1234', 'author', '');
+INSERT INTO evaluations VALUES
+    (1, 3, '2022-12-03 00:00:00', 1, 'evaluator'),
+    (2, 4, '2022-12-03 00:00:00', 1, 'author');
+INSERT INTO skippedtracks VALUES
+    (1, 'track_0001234', 'evaluator', '', '2022-12-04 00:00:00');
+"""
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A database with the baseline schema, configured as the app's database."""
+    db_file = tmp_path / "baseline.db"
+    with sqlite3.connect(db_file) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+    st.secrets._secrets = {"db": {"url": f"sqlite:///{db_file}"}}
+    st.experimental_singleton.clear()
+    yield db_file
+    st.experimental_singleton.clear()
+    st.secrets._secrets = None
+
+
+def query(db_file, statement):
+    with sqlite3.connect(db_file) as connection:
+        return connection.execute(statement).fetchall()
+
+
+def tables(db_file):
+    return {name for name, in query(db_file, "SELECT name FROM sqlite_master")}
+
+
+def test_migrate_evaluation_counts(database):
+    migrate_evaluation_counts()
+    counts = "SELECT id, evaluation_count FROM annotations ORDER BY id"
+    assert query(database, counts) == [(1, 2), (2, 0)]
+    assert "ix_annotations_evaluation_count" in tables(database)
+    migrate_evaluation_counts()  # nothing left to do
+    assert query(database, "SELECT sum(evaluation_count) FROM annotations") == [(2,)]
+
+
+def test_migrate_track_ids_requires_evaluation_counts(database):
+    with pytest.raises(RuntimeError, match="run migrate_evaluation_counts first"):
+        migrate_track_ids()
+    assert query(database, "SELECT track_id FROM annotations ORDER BY id") == [
+        ("track_0000214",),
+        ("1234",),
+    ]
+
+
+def test_migrate_track_ids(database):
+    migrate_evaluation_counts()
+    migrate_track_ids()
+    annotations = (
+        "SELECT id, track_id, typeof(track_id), evaluation_count FROM annotations "
+        "ORDER BY id"
+    )
+    assert query(database, annotations) == [
+        (1, 214, "integer", 2),
+        (2, 1234, "integer", 0),
+    ]
+    assert query(database, "SELECT track_id FROM skippedtracks") == [(1234,)]
+    assert query(database, "SELECT count(*) FROM evaluations") == [(2,)]
+    assert not any(name.endswith("_track_id_migration") for name in tables(database))
+    migrate_track_ids()  # already integers
+
+
+def test_failed_migration_is_rolled_back(database, monkeypatch):
+    migrate_evaluation_counts()
+    # skipped tracks are rebuilt after the annotations
+    monkeypatch.setattr(
+        models.SkippedTrack.__table__,
+        "create",
+        lambda *args, **kwargs: 1 / 0,
+        raising=False,
+    )
+    with pytest.raises(ZeroDivisionError):
+        migrate_track_ids()
+    assert query(database, "SELECT typeof(track_id) FROM annotations") == [
+        ("text",),
+        ("text",),
+    ]
+    assert query(database, "SELECT count(*) FROM skippedtracks") == [(1,)]
+    assert not any(name.endswith("_track_id_migration") for name in tables(database))
+
+
+def test_leftover_copy_is_refused(database):
+    migrate_evaluation_counts()
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "CREATE TABLE annotations_track_id_migration AS SELECT * FROM annotations"
+        )
+    with pytest.raises(RuntimeError, match="left over"):
+        migrate_track_ids()
+    assert query(database, "SELECT typeof(track_id) FROM skippedtracks") == [("text",)]
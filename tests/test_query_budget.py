@@ -0,0 +1,187 @@
+"""Query budgets per page: every page runs within its budget in strict mode, callbacks
+included. Run from the project root with `python -m pytest`."""
+import threading
+
+import pytest
+import streamlit as st
+import streamlit.components.v1  # noqa: F401, imported by `streamlit run` otherwise
+from sqlmodel import Session, select
+from streamlit.runtime.scriptrunner import ScriptRunContext, add_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import (
+    SCRIPT_RUN_CONTEXT_ATTR_NAME,
+)
+from streamlit.runtime.state import SafeSessionState, SessionState
+from streamlit.runtime.uploaded_file_manager import UploadedFileManager
+
+from annotation_tool import app
+from annotation_tool.backend.models import (
+    Annotation,
+    User,
+    add_to_db,
+    create_tables,
+    get_engine,
+)
+from annotation_tool.backend.music import get_track_catalog
+from annotation_tool.backend.query_budget import (
+    CALLBACK_STATEMENTS_KEY,
+    QueryBudgetExceeded,
+    track_queries,
+)
+from annotation_tool.backend.startup import start_warm_up
+from annotation_tool.pages import annotation_page
+from annotation_tool.pages.flow_control import (
+    ACTIVE_PAGE_KEY,
+    RETURNING_USER_KEY,
+    USER_ID_KEY,
+    advance_page,
+)
+
+USER_ID = "annotator"
+
+# statements per script run, callbacks included, after the start-up warm-up
+PAGE_BUDGETS = {
+    "Home": 2,
+    "User Info": 1,
+    "Profile": 1,
+    "Annotation": 3,
+    "Evaluation": 2,
+    "Leaderboard": 2,
+    "FAQs": 1,
+    "Metrics": 1,
+}
+
+
+@pytest.fixture
+def script_run_ctx(tmp_path):
+    """A seeded SQLite database, strict page budgets and a script run context for
+    the test's thread, so that st.session_state and widgets work outside
+    `streamlit run`."""
+    st.secrets._secrets = {
+        "db": {"url": f"sqlite:///{tmp_path / 'test.db'}"},
+        "music": {"tsv_file": "data/split_0_test_tracks.tsv"},
+        "metrics": {"admins": [USER_ID]},
+        "query_budget": {"strict": True, **PAGE_BUDGETS},
+    }
+    st.experimental_singleton.clear()
+    st.experimental_memo.clear()
+    create_tables()
+    add_to_db(
+        User(
+            id=USER_ID,
+            nickname="annotator",
+            age_group=1,
+            country="ES",
+            english_level=0,
+            music_doing=3,
+            music_writing=3,
+            music_reading=3,
+        )
+    )
+    add_to_db(User(id="author", nickname="author"))
+    for track_id in get_track_catalog().ids[:5]:
+        add_to_db(
+            Annotation(
+                text="A calm piano piece with soft strings.",
+                track_id=int(track_id),
+                user_id="author",
+                familiarity=1,
+                comments="",
+            )
+        )
+    ctx = ScriptRunContext(
+        session_id="test",
+        _enqueue=lambda msg: None,
+        query_string="",
+        session_state=SafeSessionState(SessionState()),
+        uploaded_file_mgr=UploadedFileManager(),
+        page_script_hash="",
+        user_info={"email": None},
+    )
+    add_script_run_ctx(threading.current_thread(), ctx)
+    start_warm_up().result()
+    yield ctx
+    setattr(threading.current_thread(), SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    st.experimental_singleton.clear()
+    st.experimental_memo.clear()
+    st.secrets._secrets = None
+
+
+def run_script(ctx: ScriptRunContext, callback=None, *args) -> None:
+    """One script run of the app the way Streamlit does it: widget callbacks first."""
+    ctx.reset(query_string=f"{USER_ID_KEY}={USER_ID}")
+    if callback is not None:
+        callback(*args)
+    app.main()
+
+
+def open_page(page: str) -> None:
+    st.session_state[ACTIVE_PAGE_KEY] = page
+    st.session_state[USER_ID_KEY] = USER_ID
+    st.session_state[RETURNING_USER_KEY] = True
+
+
+def test_track_queries_finds_duplicates(script_run_ctx, caplog):
+    statement = select(User).where(User.id == USER_ID)
+    with track_queries("test") as tracker, Session(get_engine()) as session:
+        session.exec(statement).all()
+        session.exec(statement).all()
+        session.exec(select(User).where(User.id == "author")).all()
+    assert len(tracker) == 3
+    assert list(tracker.duplicates().values()) == [2]
+    assert "test ran this statement 2 times" in caplog.text
+
+
+def test_track_queries_strict_budget(script_run_ctx):
+    with pytest.raises(QueryBudgetExceeded, match="ran 2 statements, budget is 1"):
+        with track_queries("test", budget=1, strict=True), Session(
+            get_engine()
+        ) as session:
+            session.exec(select(User)).all()
+            session.exec(select(Annotation)).all()
+
+
+def test_track_queries_ignores_other_threads(script_run_ctx):
+    def query():
+        with Session(get_engine()) as session:
+            session.exec(select(User)).all()
+
+    with track_queries("test") as tracker:
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+    assert len(tracker) == 0
+
+
+@pytest.mark.parametrize("page", PAGE_BUDGETS)
+def test_page_within_budget(script_run_ctx, page):
+    open_page(page)
+    run_script(script_run_ctx)  # cold
+    run_script(script_run_ctx)  # rerun
+
+
+def test_first_run_within_budget(script_run_ctx):
+    """A returning user opening the app's link: the session state is initialized in
+    the tracked run and the user lands on the annotation page."""
+    run_script(script_run_ctx)
+    assert st.session_state[ACTIVE_PAGE_KEY] == "Annotation"
+
+
+def test_navigation_within_budget(script_run_ctx, caplog):
+    open_page("Annotation")
+    run_script(script_run_ctx)
+    for page in ("Evaluation", "Leaderboard", "FAQs", "Annotation"):
+        run_script(script_run_ctx, advance_page, page)
+        assert st.session_state[ACTIVE_PAGE_KEY] == page
+    assert "ran this statement" not in caplog.text
+
+
+def test_callback_statements_count_towards_the_run(script_run_ctx):
+    open_page("Annotation")
+    run_script(script_run_ctx)
+    run_script(script_run_ctx)
+    track = st.session_state[annotation_page.CURRENT_TRACK]
+    st.secrets._secrets["query_budget"]["Annotation"] = 0
+    # the skip is inserted by the callback, before the script run
+    with pytest.raises(QueryBudgetExceeded, match="Annotation page ran 1 statements"):
+        run_script(script_run_ctx, annotation_page.skip_track, track.id)
+    assert st.session_state[CALLBACK_STATEMENTS_KEY] == []
@@ -0,0 +1,76 @@
+"""FenwickTree and WeightedSampler: prefix sums, proportional draws, disabled and
+excluded positions."""
+import random
+from collections import Counter
+
+import pytest
+
+from annotation_tool.backend.sampling import FenwickTree, WeightedSampler
+
+WEIGHTS = [3.0, 0.0, 1.0, 5.0, 2.0, 4.0, 0.5]
+
+
+def test_prefix_sums():
+    tree = FenwickTree(WEIGHTS)
+    for end in range(len(WEIGHTS) + 1):
+        assert tree.prefix_sum(end) == pytest.approx(sum(WEIGHTS[:end]))
+    assert tree.total == pytest.approx(sum(WEIGHTS))
+
+
+def test_set_weight():
+    tree = FenwickTree(WEIGHTS)
+    tree[3] = 0.0
+    tree[1] = 2.0
+    weights = WEIGHTS[:1] + [2.0] + WEIGHTS[2:3] + [0.0] + WEIGHTS[4:]
+    assert [tree[i] for i in range(len(tree))] == weights
+    for end in range(len(weights) + 1):
+        assert tree.prefix_sum(end) == pytest.approx(sum(weights[:end]))
+
+
+def test_find():
+    tree = FenwickTree(WEIGHTS)
+    cumulative = 0.0
+    for position, weight in enumerate(WEIGHTS):
+        if weight:
+            assert tree.find(cumulative) == position
+            assert tree.find(cumulative + weight * 0.99) == position
+        cumulative += weight
+
+
+def test_sample_is_proportional():
+    sampler = WeightedSampler([1.0, 0.0, 3.0])
+    rng = random.Random(0)
+    counts = Counter(sampler.sample(rng=rng) for _ in range(4000))
+    assert counts[1] == 0
+    assert counts[2] / counts[0] == pytest.approx(3, rel=0.15)
+
+
+def test_disable_and_enable():
+    sampler = WeightedSampler([1.0, 1.0, 1.0])
+    sampler.disable([0, 2])
+    assert {sampler.sample() for _ in range(50)} == {1}
+    sampler.disable([1])
+    assert sampler.sample() is None
+    sampler.enable([2])
+    assert sampler.sample() == 2
+    assert sampler.total == 1.0
+
+
+def test_exclude_is_for_one_draw_only():
+    sampler = WeightedSampler([1.0, 1.0, 1.0])
+    assert {sampler.sample(exclude=[0, 1, 1]) for _ in range(50)} == {2}
+    assert sampler.total == 3.0
+    sampler.disable([2])
+    assert sampler.sample(exclude=[0, 1]) is None
+    assert sampler.total == 2.0
+
+
+def test_sample_many_draws_distinct_positions():
+    sampler = WeightedSampler(WEIGHTS)
+    rng = random.Random(0)
+    drawn = sampler.sample_many(4, exclude=[0], rng=rng)
+    assert len(drawn) == len(set(drawn)) == 4
+    assert 0 not in drawn and 1 not in drawn
+    # more than there are positions with weight
+    assert sorted(sampler.sample_many(10, rng=rng)) == [0, 2, 3, 4, 5, 6]
+    assert sampler.total == pytest.approx(sum(WEIGHTS))
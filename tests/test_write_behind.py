@@ -0,0 +1,106 @@
+"""WriteBehindQueue: group commits, per-item retries of failed batches, waiting for
+a key's writes and closing."""
+import threading
+
+import pytest
+
+from annotation_tool.backend.write_behind import WriteBehindQueue
+
+
+class FakeTable:
+    """Collects written batches; a batch with a negative item fails as a whole."""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def write(self, items):
+        if any(item < 0 for item in items):
+            raise ValueError(f"bad item in {items}")
+        with self.lock:
+            self.batches.append(list(items))
+
+    @property
+    def rows(self):
+        return [item for batch in self.batches for item in batch]
+
+
+@pytest.fixture
+def table():
+    return FakeTable()
+
+
+def test_items_are_written_in_batches(table):
+    queue = WriteBehindQueue(table.write, max_delay=0.05, max_batch=10)
+    futures = [queue.submit(i, key="a") for i in range(25)]
+    queue.wait("a")
+    assert [future.result() for future in futures] == list(range(25))
+    assert sorted(table.rows) == list(range(25))
+    assert len(table.batches) < 25
+    assert all(len(batch) <= 10 for batch in table.batches)
+    assert len(queue) == 0
+    queue.close()
+
+
+def test_failed_batch_is_retried_per_item(table):
+    errors = []
+    queue = WriteBehindQueue(
+        table.write, on_error=lambda item, e: errors.append(item), max_delay=0.05
+    )
+    futures = [queue.submit(item) for item in (1, -1, 2)]
+    queue.wait()
+    assert sorted(table.rows) == [1, 2]
+    assert errors == [-1]
+    assert futures[0].result() == 1
+    with pytest.raises(ValueError):
+        futures[1].result()
+    queue.close()
+
+
+def test_wait_for_one_key(table):
+    release = threading.Event()
+
+    def slow_write(items):
+        release.wait()
+        table.write(items)
+
+    queue = WriteBehindQueue(slow_write, max_delay=0)
+    queue.submit(1, key="a")
+    queue.wait("b", timeout=0.01)  # nothing pending for "b"
+    assert len(queue) == 1
+    release.set()
+    queue.wait("a")
+    assert table.rows == [1]
+    queue.close()
+
+
+def test_when_written(table):
+    release = threading.Event()
+    called = threading.Event()
+
+    def slow_write(items):
+        release.wait()
+        table.write(items)
+
+    queue = WriteBehindQueue(slow_write, max_delay=0)
+    calls = []
+    queue.when_written("a", lambda: calls.append("right away"))
+    assert calls == ["right away"]
+    queue.submit(1, key="a")
+    queue.submit(2, key="a")
+    queue.when_written("a", called.set)
+    assert not called.is_set()
+    release.set()
+    assert called.wait(1)
+    assert sorted(table.rows) == [1, 2]
+    queue.close()
+
+
+def test_close_writes_pending_items(table):
+    queue = WriteBehindQueue(table.write, max_delay=10, max_batch=1000)
+    for i in range(5):
+        queue.submit(i)
+    queue.close()
+    assert sorted(table.rows) == list(range(5))
+    with pytest.raises(RuntimeError):
+        queue.submit(5)